@@ -4,18 +4,61 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "postgresql://localhost/ramadan_db"
+    # Serve the hot endpoints (card save/get, daily-summary, leaderboard, /me) on an
+    # async engine (asyncpg / aiosqlite) instead of the threadpool
+    ASYNC_DB: bool = False
+    ASYNC_DATABASE_URL: str | None = None  # default: DATABASE_URL with the async driver
+
+    # Connection pool
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_POOL_TIMEOUT: int = 10  # seconds to wait for a free connection
+    # Per-statement timeouts (PostgreSQL); analytics and exports use the long class
+    DB_STATEMENT_TIMEOUT_MS: int = 15000
+    DB_LONG_STATEMENT_TIMEOUT_MS: int = 300000
+
+    # Optional read replica for analytics, exports and summaries
+    READ_DATABASE_URL: str | None = None
+    READ_YOUR_WRITES_SECONDS: int = 30  # a user who just wrote keeps reading the primary (on every worker)
 
     # JWT
     JWT_SECRET_KEY: str = "change-me"
     JWT_ACCESS_TOKEN_EXPIRES: int = 86400  # seconds
     JWT_ALGORITHM: str = "HS256"
 
+    # Password reset codes
+    RESET_TOKEN_BACKEND: str = "database"  # "database" (shared by all workers) or "memory"
+    RESET_TOKEN_TTL_SECONDS: int = 900
+    RESET_TOKEN_SWEEP_INTERVAL: int = 600  # seconds between expired-token sweeps
+
+    # Rate limiting of the auth endpoints (limits per endpoint are in app/utils/rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker) or "database" (shared by all workers)
+    # Comma-separated proxy addresses/networks (e.g. "127.0.0.1,10.0.0.0/8"). Requests from
+    # them are keyed on the client address in X-Forwarded-For; empty = the peer address
+    RATE_LIMIT_TRUSTED_PROXIES: str = ""
+    RATE_LIMIT_SWEEP_INTERVAL: int = 300  # seconds between removals of stale counters
+
     # Mail
     MAIL_SERVER: str = "smtp.gmail.com"
     MAIL_PORT: int = 587
     MAIL_USE_TLS: bool = True
     MAIL_USERNAME: str | None = None
     MAIL_PASSWORD: str | None = None
+    MAIL_TIMEOUT: int = 30  # seconds
+
+    # Email outbox worker
+    EMAIL_OUTBOX_POLL_SECONDS: int = 5
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_SECONDS: int = 30  # doubled after each failed attempt
+    EMAIL_RATE_PER_SECOND: float = 5  # messages per second over the SMTP session (0 = unthrottled)
+    # A claimed batch is re-sent by another worker if not finished within this many seconds
+    # (keep it above EMAIL_OUTBOX_BATCH_SIZE x MAIL_TIMEOUT)
+    EMAIL_SEND_LEASE_SECONDS: int = 1800
+    EMAIL_OUTBOX_RETENTION_DAYS: int = 30  # sent and failed messages are deleted after this
+    EMAIL_OUTBOX_SWEEP_INTERVAL: int = 3600  # seconds between retention sweeps
 
     # Super Admin
     SUPER_ADMIN_EMAIL: str = "admin@example.com"
@@ -24,6 +67,36 @@ class Settings(BaseSettings):
     # Notifications
     ENABLE_EMAIL_NOTIFICATIONS: bool = True
 
+    # Raise on lazy relationship loads in list responses (use in tests/dev)
+    STRICT_EAGER_LOADING: bool = False
+
+    # Background exports
+    EXPORT_DIR: str = "exports"
+    EXPORT_WORKERS: int = 2
+    EXPORT_MAX_ACTIVE_JOBS: int = 10
+    EXPORT_TTL_SECONDS: int = 3600  # artifact lifetime after completion
+    EXPORT_SWEEP_INTERVAL: int = 600  # seconds between expiry sweeps
+    EXPORT_HEARTBEAT_INTERVAL: int = 30  # seconds between a worker's heartbeats on the jobs it owns
+    EXPORT_STALE_SECONDS: int = 300  # active jobs without a heartbeat this long are failed as orphaned
+
+    # User import
+    IMPORT_DIR: str = "imports"  # uploads kept here until the import completes
+    IMPORT_CHUNK_SIZE: int = 500  # rows validated, inserted and committed together
+    IMPORT_STALE_SECONDS: int = 300  # a running import with no committed chunk this long is orphaned
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 0  # processes in the hashing pool (0 = CPU count)
+    PASSWORD_HASH_MAX_QUEUE: int = 64  # waiting hash jobs before auth requests get 503
+
+    # Authenticated principal cache (role/status/halqa per user id; 0 disables)
+    PRINCIPAL_CACHE_TTL: int = 30  # seconds
+    PRINCIPAL_CACHE_SIZE: int = 10000
+
+    # Site settings / halqa directory cache: seconds before re-checking the shared
+    # version row for changes made by other workers (0 = check on every read)
+    REFERENCE_CACHE_CHECK_SECONDS: int = 5
+
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
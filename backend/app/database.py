@@ -1,9 +1,85 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import threading
+import time
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Select, create_engine, event, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
+from app.utils.pool_metrics import instrumented_pool_class
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def engine_options(url: str, pool_class=QueuePool) -> dict:
+    """Pool sizing/timeouts and the default statement timeout for an engine URL."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory SQLite keeps its single-connection pool
+        return {}
+
+    options = {
+        "pool_pre_ping": True,
+        "poolclass": instrumented_pool_class(pool_class),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+    if backend == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+class RoutingSession(Session):
+    """Session that sends SELECTs to the read replica once use_read_replica() is called.
+
+    Flushes and DML always go to the primary.
+    """
+
+    replica_bind = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self.replica_bind is not None
+            and self.info.get("use_replica")
+            and not self._flushing
+            and isinstance(clause, Select)
+        ):
+            return self.replica_bind
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+read_engine = None
+if settings.READ_DATABASE_URL:
+    read_engine = create_engine(settings.READ_DATABASE_URL, **engine_options(settings.READ_DATABASE_URL))
+    RoutingSession.replica_bind = read_engine
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+_async_engine = None
+_async_read_engine = None
+_AsyncSessionLocal = None
+
+# user_id -> time of the user's last committed write in this process (for read-your-writes);
+# the recent_writes table carries the same marker to the other workers
+_recent_writes = {}
+_recent_writes_lock = threading.Lock()
+
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
 
 
 class Base(DeclarativeBase):
@@ -17,3 +93,184 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def use_long_statement_timeout(db: Session):
+    """Give this session's transactions the long (analytics/export) statement timeout."""
+    db.info["statement_timeout_ms"] = settings.DB_LONG_STATEMENT_TIMEOUT_MS
+
+
+def disable_statement_timeout(connection):
+    """Lift the statement timeout for the rest of the connection's transaction (maintenance work)."""
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET LOCAL statement_timeout = 0")
+
+
+def recently_wrote(db: Session, user_id) -> bool:
+    """Whether user_id committed a write within READ_YOUR_WRITES_SECONDS, on any worker.
+
+    Writes from this process are known without a query; otherwise the shared
+    recent_writes row is read from the primary.
+    """
+    if user_id is None:
+        return False
+    with _recent_writes_lock:
+        wrote_at = _recent_writes.get(user_id)
+    if wrote_at is not None and time.monotonic() - wrote_at < settings.READ_YOUR_WRITES_SECONDS:
+        return True
+
+    from app.models.recent_write import RecentWrite
+
+    since = datetime.utcnow() - timedelta(seconds=settings.READ_YOUR_WRITES_SECONDS)
+    return (
+        db.query(RecentWrite.user_id)
+        .filter(RecentWrite.user_id == user_id, RecentWrite.written_at > since)
+        .first()
+        is not None
+    )
+
+
+def use_read_replica(db, user_id=None):
+    """Send this session's reads to READ_DATABASE_URL, unless user_id has just written."""
+    if settings.READ_DATABASE_URL and not recently_wrote(db, user_id):
+        db.info["use_replica"] = True
+
+
+def reporting_session(user_id=None) -> Session:
+    """Session for analytics and exports: long statement timeout, reads from the replica."""
+    db = SessionLocal()
+    use_long_statement_timeout(db)
+    use_read_replica(db, user_id)
+    return db
+
+
+def _note_write(session):
+    """Flag the transaction as a write; with a replica, also stamp the shared recent_writes row.
+
+    The stamp is part of the same transaction, so other workers see it once the write commits.
+    """
+    if session.info.get("wrote"):
+        return
+    session.info["wrote"] = True
+    user_id = session.info.get("user_id")
+    if not (settings.READ_DATABASE_URL and user_id):
+        return
+
+    from app.models.recent_write import RecentWrite
+
+    table = RecentWrite.__table__
+    values = {"user_id": user_id, "written_at": datetime.utcnow()}
+    connection = session.connection()
+    upsert_insert = _UPSERT_INSERTS.get(connection.dialect.name)
+    if upsert_insert is None:
+        updated = connection.execute(
+            table.update().where(table.c.user_id == user_id).values(written_at=values["written_at"])
+        )
+        if not updated.rowcount:
+            connection.execute(insert(table).values(**values))
+        return
+    stmt = upsert_insert(table).values(**values)
+    connection.execute(stmt.on_conflict_do_update(index_elements=["user_id"], set_={"written_at": stmt.excluded.written_at}))
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session, flush_context):
+    _note_write(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _note_write(orm_execute_state.session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
+
+
+@event.listens_for(Session, "after_commit")
+def _record_user_write(session):
+    """Remember when the request's user (session.info["user_id"]) committed a write."""
+    if session.info.pop("wrote", False) and session.info.get("user_id"):
+        with _recent_writes_lock:
+            if len(_recent_writes) > 10000:
+                _recent_writes.clear()
+            _recent_writes[session.info["user_id"]] = time.monotonic()
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_timeout(session, transaction, connection):
+    """SET LOCAL the session's statement timeout at the start of each transaction."""
+    timeout_ms = session.info.get("statement_timeout_ms")
+    if timeout_ms and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def pool_status() -> dict:
+    """Live checkout counts and wait-time histograms for the engines' pools."""
+    status = {}
+    engines = (
+        ("primary", engine),
+        ("replica", read_engine),
+        ("async", _async_engine and _async_engine.sync_engine),
+        ("async_replica", _async_read_engine and _async_read_engine.sync_engine),
+    )
+    for name, eng in engines:
+        if eng is not None and hasattr(eng.pool, "stats"):
+            status[name] = eng.pool.stats.snapshot(eng.pool)
+    return status
+
+
+def async_database_url(url: str = None) -> str:
+    """ASYNC_DATABASE_URL, or the given URL (default DATABASE_URL) rewritten for its async driver."""
+    if url is None:
+        if settings.ASYNC_DATABASE_URL:
+            return settings.ASYNC_DATABASE_URL
+        url = settings.DATABASE_URL
+    scheme, rest = url.split("://", 1)
+    return f"{_ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+
+def get_async_sessionmaker():
+    """Create the async engines on first use (the driver is only needed with ASYNC_DB)."""
+    global _async_engine, _async_read_engine, _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        url = async_database_url()
+        _async_engine = create_async_engine(url, **engine_options(url, AsyncAdaptedQueuePool))
+        session_class = RoutingSession
+        if settings.READ_DATABASE_URL:
+            read_url = async_database_url(settings.READ_DATABASE_URL)
+            _async_read_engine = create_async_engine(read_url, **engine_options(read_url, AsyncAdaptedQueuePool))
+            session_class = type(
+                "AsyncRoutingSession", (RoutingSession,), {"replica_bind": _async_read_engine.sync_engine}
+            )
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, sync_session_class=session_class, autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal
+
+
+async def get_async_db():
+    """FastAPI dependency: yield an AsyncSession per request."""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """Run fn(session, *args) without blocking the event loop.
+
+    With an AsyncSession the function runs through run_sync, so its queries
+    go through the async driver; with a sync Session it runs in the threadpool,
+    exactly like a plain `def` endpoint.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def dispose_async_engine():
+    """Shutdown: close the async engines' connections if they were created."""
+    for eng in (_async_engine, _async_read_engine):
+        if eng is not None:
+            await eng.dispose()
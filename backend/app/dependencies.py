@@ -4,18 +4,13 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from app.config import settings
-from app.database import get_db
+from app.database import get_async_db, get_db, reporting_session, run_db
+from app.utils.principals import cached_principal, load_principal
 
 security = HTTPBearer()
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-):
-    """Decode JWT and return the current user."""
-    from app.models.user import User
-
+def _token_user_id(credentials: HTTPAuthorizationCredentials) -> int:
     token = credentials.credentials
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
@@ -24,33 +19,104 @@ def get_current_user(
             raise HTTPException(status_code=401, detail="التوكن غير صالح")
     except JWTError:
         raise HTTPException(status_code=401, detail="التوكن غير صالح أو منتهي الصلاحية")
+    return int(user_id)
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+):
+    """Decode JWT and return the current user (full row)."""
+    from app.models.user import User
 
-    user = db.get(User, int(user_id))
+    user = db.get(User, _token_user_id(credentials))
     if not user:
         raise HTTPException(status_code=404, detail="المستخدم غير موجود")
+    db.info["user_id"] = user.id
     return user
 
 
-def get_active_user(user=Depends(get_current_user)):
-    """Ensure user is active."""
+def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+):
+    """Decode JWT and return the current user's cached Principal."""
+    principal = load_principal(db, _token_user_id(credentials))
+    if not principal:
+        raise HTTPException(status_code=404, detail="المستخدم غير موجود")
+    # Tag the request session so its writes count for read-your-writes
+    db.info["user_id"] = principal.id
+    return principal
+
+
+# Session dependency for the hot endpoints: async when ASYNC_DB is set
+get_request_db = get_async_db if settings.ASYNC_DB else get_db
+
+
+async def get_request_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db=Depends(get_request_db),
+):
+    """get_current_principal for the hot endpoints, on the request's (possibly async) session.
+
+    A cache hit needs no session work; a miss loads through run_db.
+    """
+    user_id = _token_user_id(credentials)
+    principal = cached_principal(user_id) or await run_db(db, load_principal, user_id)
+    if not principal:
+        raise HTTPException(status_code=404, detail="المستخدم غير موجود")
+    db.info["user_id"] = principal.id
+    return principal
+
+
+def get_reporting_db(principal=Depends(get_current_principal)):
+    """Session for analytics: long statement timeout, reads from the replica."""
+    db = reporting_session(principal.id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _require_active(user):
     if user.status != "active":
         raise HTTPException(status_code=403, detail="الحساب غير مفعل")
     return user
 
 
+def get_active_user(user=Depends(get_current_principal)):
+    """Ensure user is active."""
+    return _require_active(user)
+
+
+async def get_request_active_user(user=Depends(get_request_principal)):
+    """get_active_user for the hot endpoints (no threadpool hop)."""
+    return _require_active(user)
+
+
 class RoleChecker:
     """Callable dependency for role-based access."""
 
     def __init__(self, *allowed_roles: str):
         self.allowed_roles = allowed_roles
 
-    def __call__(self, user=Depends(get_current_user)):
+    def check(self, user):
         if user.status != "active" and user.role != "super_admin":
             raise HTTPException(status_code=403, detail="الحساب غير مفعل")
         if user.role not in self.allowed_roles:
             raise HTTPException(status_code=403, detail="ليس لديك صلاحية للوصول")
         return user
 
+    def __call__(self, user=Depends(get_current_principal)):
+        return self.check(user)
+
+
+class RequestRoleChecker(RoleChecker):
+    """RoleChecker for the hot endpoints, using get_request_principal."""
+
+    async def __call__(self, user=Depends(get_request_principal)):
+        return self.check(user)
+
 
 def create_access_token(user_id: int) -> str:
     """Create a JWT access token."""
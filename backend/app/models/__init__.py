@@ -2,3 +2,12 @@ from app.models.user import User
 from app.models.daily_card import DailyCard
 from app.models.halqa import Halqa
 from app.models.site_settings import SiteSettings
+from app.models.rollup import UserScoreTotal, HalqaDailyTotal
+from app.models.export_job import ExportJob
+from app.models.import_job import ImportJob
+from app.models.email_outbox import EmailOutbox
+from app.models.password_reset_token import PasswordResetToken
+from app.models.rate_limit import RateLimitCounter
+from app.models.cache_version import CacheVersion
+from app.models.recent_write import RecentWrite
+from app.models.digest_run import DigestRun
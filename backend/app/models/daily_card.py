@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, Float, Text, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, Float, Text, Date, DateTime, ForeignKey, UniqueConstraint, Index, event
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -27,6 +27,9 @@ class DailyCard(Base):
     extra_work = Column(Float, default=0)
     extra_work_description = Column(Text, nullable=True)
 
+    # Sum of the score fields, stored so the database can sort/aggregate on it
+    total_score = Column(Float, nullable=False, default=0, server_default="0")
+
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -34,8 +37,13 @@ class DailyCard(Base):
     # Relationships
     user = relationship("User", back_populates="daily_cards")
 
-    # Unique constraint: one card per user per day
-    __table_args__ = (UniqueConstraint("user_id", "date", name="unique_user_date"),)
+    __table_args__ = (
+        # Unique constraint: one card per user per day. Its (user_id, date) index
+        # also serves the per-user aggregations (see tests/test_card_indexes.py)
+        UniqueConstraint("user_id", "date", name="unique_user_date"),
+        # Covering index for date-range aggregations across users
+        Index("ix_daily_cards_date_user_total", "date", "user_id", postgresql_include=["total_score"]),
+    )
 
     SCORE_FIELDS = [
         "quran", "duas", "taraweeh", "tahajjud", "duha",
@@ -43,8 +51,7 @@ class DailyCard(Base):
         "enrichment_lesson", "charity_worship", "extra_work",
     ]
 
-    @property
-    def total_score(self):
+    def compute_total_score(self):
         return sum(getattr(self, field, 0) or 0 for field in self.SCORE_FIELDS)
 
     @property
@@ -56,3 +63,10 @@ class DailyCard(Base):
         if self.max_score == 0:
             return 0
         return round((self.total_score / self.max_score) * 100, 1)
+
+
+@event.listens_for(DailyCard, "before_insert")
+@event.listens_for(DailyCard, "before_update")
+def _store_total_score(mapper, connection, card):
+    """Keep the stored total in sync on every ORM write."""
+    card.total_score = card.compute_total_score()
@@ -0,0 +1,14 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Date, DateTime
+from app.database import Base
+
+
+class DigestRun(Base):
+    """One queued digest mailing; the key lets each (kind, date) go out once across all workers."""
+
+    __tablename__ = "digest_runs"
+
+    kind = Column(String(20), primary_key=True)  # daily, weekly
+    run_date = Column(Date, primary_key=True)  # reminder date, or the last day of the week
+    recipients = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from app.database import Base
+
+
+class EmailOutbox(Base):
+    """Queued outgoing email, delivered by the background outbox worker."""
+
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    to_address = Column(String(200), nullable=False)
+    subject = Column(String(300), nullable=False)
+    html_body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    # When a pending message is due; for a sending message, when its send lease expires
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Worker lookup: due pending messages and expired send leases
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
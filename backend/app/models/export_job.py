@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from app.database import Base
+
+
+class ExportJob(Base):
+    """Background analytics export; the artifact is written to EXPORT_DIR."""
+
+    __tablename__ = "export_jobs"
+
+    id = Column(String(32), primary_key=True)
+    # Hash of format + filters: identical concurrent requests share one job
+    dedup_key = Column(String(64), nullable=False, index=True)
+    # dedup_key while pending/running, NULL afterwards: the unique index allows one active job per key
+    active_key = Column(String(64), nullable=True, unique=True, index=True)
+    format = Column(String(10), nullable=False, default="csv")
+    filters = Column(Text, nullable=False, default="{}")  # JSON
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, done, failed
+    rows_total = Column(Integer, nullable=True)  # set when the export finishes
+    rows_written = Column(Integer, nullable=False, default=0)
+    file_path = Column(String(500), nullable=True)
+    error = Column(Text, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    owner = Column(String(100), nullable=True)  # worker running the job (see utils.workers)
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed by the owner while active
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)  # done and failed jobs are swept after this
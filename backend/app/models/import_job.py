@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from app.database import Base
+
+
+class ImportJob(Base):
+    """User import progress; each chunk commits together with its job update."""
+
+    __tablename__ = "import_jobs"
+
+    id = Column(String(32), primary_key=True)
+    filename = Column(String(255), nullable=True)
+    format = Column(String(10), nullable=False, default="xlsx")  # xlsx / csv
+    file_path = Column(String(500), nullable=True)  # stored upload, kept until done
+    status = Column(String(20), nullable=False, default="running")  # running, done, failed
+    last_row = Column(Integer, nullable=False, default=1)  # last committed sheet row (1 = header)
+    imported = Column(Integer, nullable=False, default=0)
+    errors = Column(Text, nullable=False, default="[]")  # JSON list of per-row messages
+    error = Column(Text, nullable=True)  # reason the import stopped
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    owner = Column(String(100), nullable=True)  # worker running the import (see utils.workers)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Also the heartbeat: every committed chunk refreshes it
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
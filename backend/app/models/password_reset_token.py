@@ -0,0 +1,14 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime
+from app.database import Base
+
+
+class PasswordResetToken(Base):
+    """Outstanding password reset code (stored as a keyed hash), one per email."""
+
+    __tablename__ = "password_reset_tokens"
+
+    email = Column(String(200), primary_key=True)
+    token_hash = Column(String(64), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+
+class RateLimitCounter(Base):
+    """Request count for one rate limit key in one fixed window (shared rate limiter backend)."""
+
+    __tablename__ = "rate_limit_counters"
+
+    key = Column(String(255), primary_key=True)
+    window_start = Column(Integer, primary_key=True)  # epoch seconds
+    count = Column(Integer, nullable=False, default=0)
+    expires_at = Column(Integer, nullable=False, index=True)  # epoch seconds; swept after this
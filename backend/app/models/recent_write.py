@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, DateTime
+from app.database import Base
+
+
+class RecentWrite(Base):
+    """Time of each user's last committed write, shared by all workers for read-your-writes."""
+
+    __tablename__ = "recent_writes"
+
+    user_id = Column(Integer, primary_key=True)
+    written_at = Column(DateTime, nullable=False)
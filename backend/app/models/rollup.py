@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, Float, Date, ForeignKey
+from app.database import Base
+
+
+class UserScoreTotal(Base):
+    """Cumulative card totals per user, maintained alongside card writes."""
+
+    __tablename__ = "user_score_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_score = Column(Float, nullable=False, default=0)
+    cards_count = Column(Integer, nullable=False, default=0)
+
+
+class HalqaDailyTotal(Base):
+    """Per-halqa per-day card totals and submission counts.
+
+    Cards are counted under the member's current halqa: reassigning a member
+    moves their cards' totals to the new halqa (see utils.rollups).
+    """
+
+    __tablename__ = "halqa_daily_totals"
+
+    halqa_id = Column(Integer, ForeignKey("halqas.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    total_score = Column(Float, nullable=False, default=0)
+    cards_count = Column(Integer, nullable=False, default=0)
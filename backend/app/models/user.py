@@ -1,8 +1,9 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, event
 from sqlalchemy.orm import relationship
-from passlib.hash import bcrypt as bcrypt_hash
 from app.database import Base
+from app.utils.passwords import hash_password, verify_password
+from app.utils.search import normalize_search_text
 
 
 class User(Base):
@@ -20,6 +21,9 @@ class User(Base):
     country = Column(String(100), nullable=False)
     referral_source = Column(Text, nullable=True)
 
+    # Normalized full name for admin search (see app/utils/search.py)
+    search_name = Column(String(200), nullable=True)
+
     # Status & Roles
     status = Column(String(20), default="pending")  # pending, active, rejected, withdrawn
     role = Column(String(20), default="participant")  # participant, supervisor, super_admin
@@ -39,8 +43,20 @@ class User(Base):
         "Halqa", back_populates="supervisor", foreign_keys="Halqa.supervisor_id", uselist=False
     )
 
+    __table_args__ = (
+        # Keyset pagination order for user listings
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
+
     def set_password(self, password: str):
-        self.password_hash = bcrypt_hash.hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return bcrypt_hash.verify(password, self.password_hash)
+        return verify_password(password, self.password_hash)
+
+
+@event.listens_for(User, "before_insert")
+@event.listens_for(User, "before_update")
+def _store_search_name(mapper, connection, user):
+    """Keep the normalized search name in sync on every ORM write."""
+    user.search_name = normalize_search_text(user.full_name)
@@ -1,20 +1,35 @@
 import io
-from datetime import date, timedelta
+import os
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
-from fastapi.responses import StreamingResponse, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, pool_status, run_db
 from app.config import settings as app_settings
 from app.models.user import User
-from app.models.daily_card import DailyCard
 from app.models.halqa import Halqa
-from app.dependencies import RoleChecker
+from app.models.export_job import ExportJob
+from app.models.import_job import ImportJob
+from app.dependencies import RoleChecker, get_reporting_db
+from app.utils.principals import Principal
 from app.schemas.user import (
     AdminUserUpdate, AdminResetPassword, SetRole,
-    AssignHalqa, RejectRegistration, user_to_response,
+    AssignHalqa, RejectRegistration, user_to_response, user_load_options,
 )
-from app.schemas.halqa import HalqaCreate, HalqaUpdate, AssignMembers, halqa_to_response
+from app.schemas.halqa import (
+    HalqaCreate, HalqaUpdate, AssignMembers, halqa_to_response, halqa_list_to_response,
+)
+from app.schemas.export_job import ExportRequest, export_job_to_response
+from app.schemas.import_job import import_job_to_response
+from app.utils.analytics import build_analytics_results
+from app.utils.digests import DIGESTS, start_digest
+from app.utils.exports import stream_csv_export, stream_xlsx_export
+from app.utils.export_jobs import submit_export
+from app.utils.imports import TEMPLATE_HEADERS, start_import, resume_import
+from app.utils.passwords import hash_password_async, password_hash_stats
+from app.utils.rate_limit import rate_limit_stats
+from app.utils.pagination import MAX_PAGE_SIZE, paginated_response
+from app.utils.search import search_filter
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -27,21 +42,32 @@ require_admin = RoleChecker("super_admin")
 @router.get("/registrations")
 def get_registrations(
     status: str = Query("pending"),
-    admin: User = Depends(require_admin),
+    limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    with_total: bool = Query(False),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    """Get all pending registrations."""
-    if status == "all":
-        users = db.query(User).order_by(User.created_at.desc()).all()
-    else:
-        users = db.query(User).filter_by(status=status).order_by(User.created_at.desc()).all()
-    return {"users": [user_to_response(u) for u in users]}
+    """Get all pending registrations.
+
+    Passing `limit` or `cursor` switches to keyset pagination (newest first).
+    """
+    query = db.query(User).options(*user_load_options())
+    if status != "all":
+        query = query.filter_by(status=status)
+
+    if limit is None and cursor is None:
+        users = query.order_by(User.created_at.desc()).all()
+        return {"users": [user_to_response(u) for u in users]}
+    return paginated_response(
+        query, [User.created_at, User.id], "users", user_to_response, limit, cursor, with_total,
+    )
 
 
 @router.post("/registration/{user_id}/approve")
 def approve_registration(
     user_id: int,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Approve a registration request."""
@@ -60,7 +86,7 @@ def approve_registration(
 def reject_registration(
     user_id: int,
     data: RejectRegistration = None,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Reject a registration request."""
@@ -81,11 +107,17 @@ def get_all_users(
     gender: str = Query(None),
     halqa_id: int = Query(None),
     search: str = Query(""),
-    admin: User = Depends(require_admin),
+    limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    with_total: bool = Query(False),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    """Get all users with optional filters."""
-    query = db.query(User)
+    """Get all users with optional filters.
+
+    Passing `limit` or `cursor` switches to keyset pagination (newest first).
+    """
+    query = db.query(User).options(*user_load_options())
 
     if status:
         query = query.filter_by(status=status)
@@ -96,19 +128,23 @@ def get_all_users(
     if search:
         query = query.filter(
             or_(
-                User.full_name.ilike(f"%{search}%"),
-                User.email.ilike(f"%{search}%"),
+                search_filter(User.search_name, search),
+                search_filter(User.email, search),
             )
         )
 
-    users = query.order_by(User.created_at.desc()).all()
-    return {"users": [user_to_response(u) for u in users]}
+    if limit is None and cursor is None:
+        users = query.order_by(User.created_at.desc()).all()
+        return {"users": [user_to_response(u) for u in users]}
+    return paginated_response(
+        query, [User.created_at, User.id], "users", user_to_response, limit, cursor, with_total,
+    )
 
 
 @router.get("/user/{user_id}")
 def get_user(
     user_id: int,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Get user details."""
@@ -122,7 +158,7 @@ def get_user(
 def update_user(
     user_id: int,
     data: AdminUserUpdate,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Update user details."""
@@ -142,26 +178,31 @@ def update_user(
 
 
 @router.post("/user/{user_id}/reset-password")
-def admin_reset_password(
+async def admin_reset_password(
     user_id: int,
     data: AdminResetPassword,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Reset user password by admin."""
-    user = db.get(User, user_id)
+    # Session work runs in the threadpool; only the hashing is awaited here
+    user = await run_db(db, Session.get, User, user_id)
     if not user:
         raise HTTPException(404, detail="المستخدم غير موجود")
 
-    user.set_password(data.new_password)
-    db.commit()
+    await run_db(db, _save_password_hash, user, await hash_password_async(data.new_password))
     return {"message": "تم إعادة تعيين كلمة المرور"}
 
 
+def _save_password_hash(db: Session, user, password_hash: str):
+    user.password_hash = password_hash
+    db.commit()
+
+
 @router.post("/user/{user_id}/withdraw")
 def withdraw_user(
     user_id: int,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Mark user as withdrawn."""
@@ -178,7 +219,7 @@ def withdraw_user(
 @router.post("/user/{user_id}/activate")
 def activate_user(
     user_id: int,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Re-activate user."""
@@ -199,7 +240,7 @@ def activate_user(
 def set_user_role(
     user_id: int,
     data: SetRole,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Set user role (supervisor, super_admin, participant)."""
@@ -227,18 +268,18 @@ def set_user_role(
 
 @router.get("/halqas")
 def get_halqas(
-    admin: User = Depends(require_admin),
+    submitted_today: bool = Query(False),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Get all halqas."""
-    halqas = db.query(Halqa).all()
-    return {"halqas": [halqa_to_response(h) for h in halqas]}
+    return {"halqas": halqa_list_to_response(db, submitted_today=submitted_today)}
 
 
 @router.post("/halqa")
 def create_halqa(
     data: HalqaCreate,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Create a new halqa."""
@@ -260,7 +301,7 @@ def create_halqa(
 def update_halqa(
     halqa_id: int,
     data: HalqaUpdate,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Update halqa details."""
@@ -282,7 +323,7 @@ def update_halqa(
 def assign_members_to_halqa(
     halqa_id: int,
     data: AssignMembers,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Assign members to a halqa."""
@@ -303,7 +344,7 @@ def assign_members_to_halqa(
 def assign_user_halqa(
     user_id: int,
     data: AssignHalqa,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Assign a single user to a halqa."""
@@ -320,95 +361,6 @@ def assign_user_halqa(
 # ─── Analytics Dashboard ──────────────────────────────────────────────────────
 
 
-def _build_analytics_results(
-    db: Session,
-    gender: str = None,
-    halqa_id: int = None,
-    supervisor: str = None,
-    member: str = None,
-    min_pct: float = None,
-    max_pct: float = None,
-    period: str = "all",
-    date_from: str = None,
-    date_to: str = None,
-    sort_by: str = "score",
-    sort_order: str = "desc",
-):
-    """Shared helper for analytics and export."""
-    query = db.query(User).filter_by(status="active")
-
-    if gender:
-        query = query.filter_by(gender=gender)
-    if halqa_id:
-        query = query.filter_by(halqa_id=halqa_id)
-    if member:
-        query = query.filter(User.full_name.ilike(f"%{member}%"))
-    if supervisor:
-        halqas = db.query(Halqa).join(User, Halqa.supervisor_id == User.id).filter(
-            User.full_name.ilike(f"%{supervisor}%")
-        ).all()
-        halqa_ids = [h.id for h in halqas]
-        if halqa_ids:
-            query = query.filter(User.halqa_id.in_(halqa_ids))
-
-    users = query.all()
-
-    # Date range
-    today = date.today()
-    start_date = None
-    end_date = None
-
-    if date_from:
-        start_date = date.fromisoformat(date_from)
-    elif period == "weekly":
-        start_date = today - timedelta(days=today.weekday())
-    elif period == "monthly":
-        start_date = today.replace(day=1)
-
-    if date_to:
-        end_date = date.fromisoformat(date_to)
-
-    results = []
-    for u in users:
-        card_query = db.query(DailyCard).filter_by(user_id=u.id)
-        if start_date:
-            card_query = card_query.filter(DailyCard.date >= start_date)
-        if end_date:
-            card_query = card_query.filter(DailyCard.date <= end_date)
-
-        cards = card_query.all()
-        total = sum(c.total_score for c in cards)
-        max_total = sum(c.max_score for c in cards) if cards else 0
-        pct = round((total / max_total) * 100, 1) if max_total > 0 else 0
-
-        if min_pct is not None and pct < min_pct:
-            continue
-        if max_pct is not None and pct > max_pct:
-            continue
-
-        results.append({
-            "user_id": u.id,
-            "full_name": u.full_name,
-            "gender": u.gender,
-            "halqa_name": u.halqa.name if u.halqa else "بدون حلقة",
-            "supervisor_name": u.halqa.supervisor.full_name if u.halqa and u.halqa.supervisor else "-",
-            "total_score": total,
-            "max_score": max_total,
-            "percentage": pct,
-            "cards_count": len(cards),
-        })
-
-    if sort_by == "name":
-        results.sort(key=lambda x: x["full_name"], reverse=(sort_order == "desc"))
-    else:
-        results.sort(key=lambda x: x["total_score"], reverse=(sort_order == "desc"))
-
-    for i, r in enumerate(results):
-        r["rank"] = i + 1
-
-    return results
-
-
 @router.get("/analytics")
 def get_analytics(
     gender: str = Query(None),
@@ -422,11 +374,11 @@ def get_analytics(
     date_to: str = Query(None),
     sort_by: str = Query("score"),
     sort_order: str = Query("desc"),
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    admin: Principal = Depends(require_admin),
+    db: Session = Depends(get_reporting_db),
 ):
     """Get comprehensive analytics."""
-    results = _build_analytics_results(
+    results = build_analytics_results(
         db, gender=gender, halqa_id=halqa_id, supervisor=supervisor,
         member=member, min_pct=min_pct, max_pct=max_pct, period=period,
         date_from=date_from, date_to=date_to, sort_by=sort_by, sort_order=sort_order,
@@ -464,148 +416,126 @@ def export_data(
     date_to: str = Query(None),
     sort_by: str = Query("score"),
     sort_order: str = Query("desc"),
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    admin: Principal = Depends(require_admin),
 ):
     """Export analytics data as CSV or XLSX with all applied filters."""
-    import csv
-    from openpyxl import Workbook
-
-    results = _build_analytics_results(
-        db, gender=gender, halqa_id=halqa_id, supervisor=supervisor,
+    filters = dict(
+        gender=gender, halqa_id=halqa_id, supervisor=supervisor,
         member=member, min_pct=min_pct, max_pct=max_pct, period=period,
         date_from=date_from, date_to=date_to, sort_by=sort_by, sort_order=sort_order,
     )
 
-    gender_map = {"male": "ذكر", "female": "أنثى"}
-    rows = []
-    for r in results:
-        rows.append({
-            "الترتيب": r["rank"],
-            "الاسم": r["full_name"],
-            "الجنس": gender_map.get(r["gender"], r["gender"]),
-            "الحلقة": r["halqa_name"],
-            "المشرف": r["supervisor_name"],
-            "مجموع النقاط": r["total_score"],
-            "الحد الأعلى": r["max_score"],
-            "عدد البطاقات": r["cards_count"],
-            "النسبة %": r["percentage"],
-        })
-
     if format == "xlsx":
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "النتائج"
-        ws.sheet_view.rightToLeft = True
-
-        if rows:
-            headers = list(rows[0].keys())
-            ws.append(headers)
-            for row in rows:
-                ws.append([row[h] for h in headers])
-
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
         return StreamingResponse(
-            output,
+            stream_xlsx_export(filters, user_id=admin.id),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={"Content-Disposition": "attachment; filename=ramadan_results.xlsx"},
         )
     else:
-        # UTF-8 BOM so Excel opens Arabic correctly
-        output = io.StringIO()
-        if rows:
-            writer = csv.DictWriter(output, fieldnames=rows[0].keys())
-            writer.writeheader()
-            writer.writerows(rows)
-
-        csv_bytes = "\ufeff" + output.getvalue()
-        return Response(
-            content=csv_bytes.encode("utf-8"),
+        return StreamingResponse(
+            stream_csv_export(filters, user_id=admin.id),
             media_type="text/csv; charset=utf-8-sig",
             headers={"Content-Disposition": "attachment; filename=ramadan_results.csv"},
         )
 
 
+@router.post("/exports")
+def create_export_job(
+    data: ExportRequest,
+    admin: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """Start a background export; identical active requests share one job."""
+    filters = data.model_dump(exclude={"format"})
+    job = submit_export(db, data.format, filters, admin.id)
+    return {"message": "تم بدء التصدير", "job": export_job_to_response(job)}
+
+
+@router.get("/exports/{job_id}")
+def get_export_job(
+    job_id: str,
+    admin: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """Get background export status and progress."""
+    job = db.get(ExportJob, job_id)
+    if not job:
+        raise HTTPException(404, detail="عملية التصدير غير موجودة")
+    return {"job": export_job_to_response(job)}
+
+
+@router.get("/exports/{job_id}/download")
+def download_export_job(
+    job_id: str,
+    admin: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """Download a finished background export."""
+    job = db.get(ExportJob, job_id)
+    if not job:
+        raise HTTPException(404, detail="عملية التصدير غير موجودة")
+    if job.status != "done" or not job.file_path or not os.path.exists(job.file_path):
+        raise HTTPException(409, detail="ملف التصدير غير جاهز")
+
+    if job.format == "xlsx":
+        return FileResponse(
+            job.file_path,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            filename="ramadan_results.xlsx",
+        )
+    return FileResponse(job.file_path, media_type="text/csv; charset=utf-8-sig", filename="ramadan_results.csv")
+
+
 @router.post("/import")
 def import_users(
     file: UploadFile = File(...),
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    """Import users from Excel file."""
-    from openpyxl import load_workbook
+    """Import users from an Excel (.xlsx) or CSV file, committing in chunks."""
+    job = start_import(db, file, admin.id)
+    return _import_result(job)
 
-    wb = load_workbook(file.file)
-    ws = wb.active
 
-    headers = [cell.value for cell in ws[1]]
-    required_headers = ["الاسم", "الجنس", "العمر", "الهاتف", "البريد", "الدولة"]
-
-    for h in required_headers:
-        if h not in headers:
-            raise HTTPException(400, detail=f"العمود {h} مفقود من الملف")
-
-    imported = 0
-    errors = []
-    seen_emails = set()
-
-    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        # Skip completely empty rows
-        if all(cell is None or str(cell).strip() == "" for cell in row):
-            continue
-        row_data = dict(zip(headers, row))
-        try:
-            raw_email = row_data.get("البريد")
-            email = str(raw_email).lower().strip() if raw_email is not None else ""
-            if not email or email == "none":
-                errors.append(f"صف {row_idx}: البريد فارغ")
-                continue
-            if email in seen_emails:
-                errors.append(f"صف {row_idx}: بريد مكرر في الملف")
-                continue
-            if db.query(User).filter_by(email=email).first():
-                errors.append(f"صف {row_idx}: البريد مسجل مسبقاً ({email})")
-                continue
-
-            seen_emails.add(email)
-            raw_gender = str(row_data.get("الجنس", "")).strip()
-            gender_map = {"ذكر": "male", "أنثى": "female", "male": "male", "female": "female"}
-            gender = gender_map.get(raw_gender, raw_gender)
-
-            raw_age = row_data.get("العمر", 0)
-            age = int(raw_age) if raw_age is not None and str(raw_age).strip() else 0
-
-            user = User(
-                full_name=str(row_data.get("الاسم") or "").strip(),
-                gender=gender,
-                age=age,
-                phone=str(row_data.get("الهاتف") or "").strip(),
-                email=email,
-                country=str(row_data.get("الدولة") or "").strip(),
-                referral_source=str(row_data.get("المصدر") or "").strip(),
-                status="pending",
-                role="participant",
-            )
-            user.set_password("123456")  # Default password
-            db.add(user)
-            db.flush()
-            imported += 1
-        except Exception as e:
-            db.rollback()
-            errors.append(f"صف {row_idx}: {str(e)}")
+@router.get("/import/{job_id}")
+def get_import_job(
+    job_id: str,
+    admin: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """Get import job progress."""
+    job = db.get(ImportJob, job_id)
+    if not job:
+        raise HTTPException(404, detail="عملية الاستيراد غير موجودة")
+    return {"job": import_job_to_response(job)}
 
-    db.commit()
-    return {
-        "message": f"تم استيراد {imported} مشارك في قائمة الانتظار",
-        "errors": errors,
-    }
+
+@router.post("/import/{job_id}/resume")
+def resume_import_job(
+    job_id: str,
+    admin: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """Resume a failed import from its last committed chunk."""
+    job = db.get(ImportJob, job_id)
+    if not job:
+        raise HTTPException(404, detail="عملية الاستيراد غير موجودة")
+    job = resume_import(db, job)
+    return _import_result(job)
+
+
+def _import_result(job) -> dict:
+    response = import_job_to_response(job)
+    if job.status == "failed":
+        message = f"توقف الاستيراد بعد استيراد {job.imported} مشارك، يمكن استئنافه"
+    else:
+        message = f"تم استيراد {job.imported} مشارك في قائمة الانتظار"
+    return {"message": message, "errors": response["errors"], "job": response}
 
 
 @router.get("/import-template")
 def get_import_template(
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
 ):
     """Download import template."""
     from openpyxl import Workbook
@@ -615,8 +545,7 @@ def get_import_template(
     ws.title = "قالب الاستيراد"
     ws.sheet_view.rightToLeft = True
 
-    headers = ["الاسم", "الجنس", "العمر", "الهاتف", "البريد", "الدولة", "المصدر"]
-    ws.append(headers)
+    ws.append(TEMPLATE_HEADERS)
 
     # Example row
     ws.append(["أحمد محمد علي", "ذكر", 25, "+966500000000", "ahmed@example.com", "السعودية", "صديق"])
@@ -629,3 +558,37 @@ def get_import_template(
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": "attachment; filename=import_template.xlsx"},
     )
+
+
+# ─── Digests ──────────────────────────────────────────────────────────────────
+
+
+@router.post("/digests/{kind}")
+def send_digest(kind: str, admin: Principal = Depends(require_admin)):
+    """Queue today's daily reminder or weekly summary mailing in the background."""
+    if kind not in DIGESTS:
+        raise HTTPException(404, detail="نوع الرسائل غير موجود")
+    if not start_digest(kind):
+        raise HTTPException(409, detail="تم إرسال هذه الرسائل اليوم بالفعل")
+    return {"message": "بدأ إرسال الرسائل"}
+
+
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+
+
+@router.get("/metrics/password-hashing")
+def get_password_hashing_metrics(admin: Principal = Depends(require_admin)):
+    """Queue depth and latency of the password hashing pool."""
+    return password_hash_stats()
+
+
+@router.get("/metrics/db-pool")
+def get_db_pool_metrics(admin: Principal = Depends(require_admin)):
+    """Live connection pool checkouts, overflow and checkout wait histograms."""
+    return pool_status()
+
+
+@router.get("/metrics/rate-limits")
+def get_rate_limit_metrics(admin: Principal = Depends(require_admin)):
+    """Allowed and rejected auth requests per endpoint and key type."""
+    return rate_limit_stats()
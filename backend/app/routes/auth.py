@@ -1,34 +1,49 @@
-import random
-import string
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, run_db
 from app.config import settings as app_settings
 from app.models.user import User
-from app.models.site_settings import SiteSettings
-from app.dependencies import get_current_user, create_access_token
+from app.dependencies import get_current_user, get_request_principal, get_request_db, create_access_token
+from app.utils.principals import Principal
 from app.schemas.user import (
     UserRegister, UserLogin, UserProfileUpdate,
-    ChangePassword, ForgotPassword, ResetPassword, user_to_response,
+    ChangePassword, ForgotPassword, ResetPassword, user_to_response, user_load_options,
 )
 from app.utils.email import send_new_registration_email, send_password_reset_email
+from app.utils.passwords import hash_password_async, verify_password_async
+from app.utils.rate_limit import check_rate_limit, check_rate_limit_async
+from app.utils.reference_cache import get_site_settings
+from app.utils.reset_tokens import generate_reset_token, reset_token_store
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
-# In-memory store for reset tokens (use Redis in production)
-reset_tokens = {}
-
 
 @router.post("/register")
-def register(data: UserRegister, db: Session = Depends(get_db)):
+async def register(data: UserRegister, request: Request, db: Session = Depends(get_db)):
     """Register a new participant."""
+    await check_rate_limit_async("register", request)
     if data.password != data.confirm_password:
         raise HTTPException(400, detail="كلمتا المرور غير متطابقتين")
 
-    existing = db.query(User).filter_by(email=data.email.lower().strip()).first()
-    if existing:
+    # Session work runs in the threadpool (run_db); only the hashing is awaited here
+    if await run_db(db, _find_user, data.email.lower().strip()):
         raise HTTPException(400, detail="البريد الإلكتروني مسجل مسبقاً")
 
+    password_hash = await hash_password_async(data.password)
+    return await run_db(db, _create_registration, data, password_hash)
+
+
+def _find_user(db: Session, email: str):
+    return db.query(User).filter_by(email=email).first()
+
+
+def _save_password_hash(db: Session, user, password_hash: str):
+    user.password_hash = password_hash
+    db.commit()
+
+
+def _create_registration(db: Session, data: UserRegister, password_hash: str):
     user = User(
         full_name=data.full_name.strip(),
         gender=data.gender,
@@ -39,33 +54,39 @@ def register(data: UserRegister, db: Session = Depends(get_db)):
         referral_source=data.referral_source.strip() if data.referral_source else "",
         status="pending",
         role="participant",
+        password_hash=password_hash,
     )
-    user.set_password(data.password)
 
     db.add(user)
     db.commit()
     db.refresh(user)
 
-    # Send notification email
+    # Queue notification email (sent by the outbox worker)
     try:
-        site = db.query(SiteSettings).first()
-        if site and site.enable_email_notifications:
-            send_new_registration_email(user_to_response(user))
+        site = get_site_settings(db)
+        if site and site["enable_email_notifications"]:
+            send_new_registration_email(db, user_to_response(user))
+            db.commit()
     except Exception:
-        pass
+        db.rollback()
 
     return {"message": "تم إرسال طلب التسجيل بنجاح. يرجى انتظار الموافقة."}
 
 
 @router.post("/login")
-def login(data: UserLogin, db: Session = Depends(get_db)):
+async def login(data: UserLogin, request: Request, db: Session = Depends(get_db)):
     """Login with email and password."""
     email = data.email.lower().strip()
-    user = db.query(User).filter_by(email=email).first()
+    await check_rate_limit_async("login", request, email)
+    user = await run_db(db, _find_user, email)
 
-    if not user or not user.check_password(data.password):
+    if not user or not await verify_password_async(data.password, user.password_hash):
         raise HTTPException(401, detail="بيانات الدخول غير صحيحة")
 
+    return await run_db(db, _complete_login, user, email)
+
+
+def _complete_login(db: Session, user, email: str):
     # Check if user is primary super admin - auto-promote before status checks
     is_primary_admin = email == app_settings.SUPER_ADMIN_EMAIL.lower()
     if is_primary_admin and (user.role != "super_admin" or user.status != "active"):
@@ -88,8 +109,18 @@ def login(data: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/me")
-def get_me(user: User = Depends(get_current_user)):
+async def get_me(
+    principal: Principal = Depends(get_request_principal),
+    db: Session | AsyncSession = Depends(get_request_db),
+):
     """Get current user profile."""
+    return await run_db(db, _get_me, principal.id)
+
+
+def _get_me(db: Session, user_id: int):
+    user = db.get(User, user_id, options=user_load_options())
+    if not user:
+        raise HTTPException(404, detail="المستخدم غير موجود")
     return {"user": user_to_response(user)}
 
 
@@ -112,54 +143,57 @@ def update_profile(
 
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     data: ChangePassword,
+    request: Request,
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Change password from within account."""
-    if not user.check_password(data.current_password):
+    await check_rate_limit_async("change_password", request, user.email)
+    if not await verify_password_async(data.current_password, user.password_hash):
         raise HTTPException(400, detail="كلمة المرور الحالية غير صحيحة")
 
     if data.new_password != data.confirm_password:
         raise HTTPException(400, detail="كلمتا المرور غير متطابقتين")
 
-    user.set_password(data.new_password)
-    db.commit()
+    await run_db(db, _save_password_hash, user, await hash_password_async(data.new_password))
     return {"message": "تم تغيير كلمة المرور بنجاح"}
 
 
 @router.post("/forgot-password")
-def forgot_password(data: ForgotPassword, db: Session = Depends(get_db)):
+def forgot_password(data: ForgotPassword, request: Request, db: Session = Depends(get_db)):
     """Request password reset."""
     email = data.email.lower().strip()
+    check_rate_limit("forgot_password", request, email)
     user = db.query(User).filter_by(email=email).first()
 
     if user:
-        token = "".join(random.choices(string.digits, k=6))
-        reset_tokens[email] = token
+        token = generate_reset_token()
         try:
-            send_password_reset_email(email, token)
+            reset_token_store.issue(db, email, token)
+            send_password_reset_email(db, email, token)
+            db.commit()
         except Exception:
-            pass
+            db.rollback()
 
     return {"message": "إذا كان البريد مسجلاً، سيتم إرسال رمز إعادة التعيين"}
 
 
 @router.post("/reset-password")
-def reset_password(data: ResetPassword, db: Session = Depends(get_db)):
+async def reset_password(data: ResetPassword, request: Request, db: Session = Depends(get_db)):
     """Reset password with token."""
     email = data.email.lower().strip()
+    await check_rate_limit_async("reset_password", request, email)
 
-    if reset_tokens.get(email) != data.token:
+    # The database store deletes the token in the same transaction as the password change
+    if not await run_db(db, reset_token_store.consume, email, data.token):
         raise HTTPException(400, detail="رمز إعادة التعيين غير صحيح")
 
-    user = db.query(User).filter_by(email=email).first()
+    user = await run_db(db, _find_user, email)
     if not user:
         raise HTTPException(404, detail="المستخدم غير موجود")
 
-    user.set_password(data.new_password)
-    db.commit()
-    del reset_tokens[email]
+    await run_db(db, _save_password_hash, user, await hash_password_async(data.new_password))
 
     return {"message": "تم إعادة تعيين كلمة المرور بنجاح"}
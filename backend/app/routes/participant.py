@@ -1,22 +1,29 @@
 from datetime import date, timedelta
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models.user import User
+from app.database import get_db, run_db
 from app.models.daily_card import DailyCard
-from app.dependencies import get_active_user
+from app.dependencies import get_active_user, get_request_active_user, get_request_db
+from app.utils.principals import Principal
 from app.schemas.daily_card import DailyCardCreate, card_to_response
+from app.utils.rollups import record_card_write
+from app.utils.scores import empty_summary, summarize_windows
 
 router = APIRouter(prefix="/api/participant", tags=["participant"])
 
 
 @router.post("/card")
-def save_card(
+async def save_card(
     data: DailyCardCreate,
-    user: User = Depends(get_active_user),
-    db: Session = Depends(get_db),
+    user: Principal = Depends(get_request_active_user),
+    db: Session | AsyncSession = Depends(get_request_db),
 ):
     """Create a daily card. Each date can only be submitted once (no editing)."""
+    return await run_db(db, _save_card, user, data)
+
+
+def _save_card(db: Session, user: Principal, data: DailyCardCreate):
     if data.date > date.today():
         raise HTTPException(400, detail="لا يمكن إدخال بطاقة بتاريخ مستقبلي")
 
@@ -30,18 +37,23 @@ def save_card(
     card.extra_work_description = data.extra_work_description
 
     db.add(card)
+    record_card_write(db, user.id, card)
     db.commit()
     db.refresh(card)
     return {"message": "تم حفظ البطاقة", "card": card_to_response(card)}
 
 
 @router.get("/card/{card_date}")
-def get_card(
+async def get_card(
     card_date: str,
-    user: User = Depends(get_active_user),
-    db: Session = Depends(get_db),
+    user: Principal = Depends(get_request_active_user),
+    db: Session | AsyncSession = Depends(get_request_db),
 ):
     """Get daily card for a specific date."""
+    return await run_db(db, _get_card, user, card_date)
+
+
+def _get_card(db: Session, user: Principal, card_date: str):
     card = db.query(DailyCard).filter_by(
         user_id=user.id, date=date.fromisoformat(card_date)
     ).first()
@@ -53,7 +65,7 @@ def get_card(
 
 @router.get("/cards")
 def get_all_cards(
-    user: User = Depends(get_active_user),
+    user: Principal = Depends(get_active_user),
     db: Session = Depends(get_db),
 ):
     """Get all cards for current user."""
@@ -63,40 +75,27 @@ def get_all_cards(
 
 @router.get("/stats")
 def get_stats(
-    user: User = Depends(get_active_user),
+    user: Principal = Depends(get_active_user),
     db: Session = Depends(get_db),
 ):
     """Get participant statistics (no ranking info)."""
     today = date.today()
-
-    # Today's card
-    today_card = db.query(DailyCard).filter_by(user_id=user.id, date=today).first()
-    today_percentage = today_card.percentage if today_card else 0
-
-    # Weekly stats (current week)
     week_start = today - timedelta(days=today.weekday())
-    week_cards = db.query(DailyCard).filter(
-        DailyCard.user_id == user.id,
-        DailyCard.date >= week_start,
-        DailyCard.date <= today,
-    ).all()
-
-    week_total = sum(c.total_score for c in week_cards)
-    week_max = sum(c.max_score for c in week_cards) if week_cards else 0
-    week_percentage = round((week_total / week_max) * 100, 1) if week_max > 0 else 0
-
-    # Overall stats
-    all_cards = db.query(DailyCard).filter_by(user_id=user.id).all()
-    overall_total = sum(c.total_score for c in all_cards)
-    overall_max = sum(c.max_score for c in all_cards) if all_cards else 0
-    overall_percentage = round((overall_total / overall_max) * 100, 1) if overall_max > 0 else 0
 
-    return {
-        "today_percentage": today_percentage,
-        "week_percentage": week_percentage,
-        "overall_percentage": overall_percentage,
-        "overall_total": overall_total,
-        "cards_count": len(all_cards),
+    # Today, current week and overall in one conditional aggregate
+    windows = {
+        "today": (today, today),
+        "week": (week_start, today),
+        "overall": (None, None),
     }
+    stats = summarize_windows(db, [user.id], windows).get(user.id)
+    if not stats:
+        stats = {name: empty_summary() for name in windows}
 
-
+    return {
+        "today_percentage": stats["today"]["percentage"],
+        "week_percentage": stats["week"]["percentage"],
+        "overall_percentage": stats["overall"]["percentage"],
+        "overall_total": stats["overall"]["total_score"],
+        "cards_count": stats["overall"]["cards_count"],
+    }
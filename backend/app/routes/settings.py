@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.user import User
 from app.models.site_settings import SiteSettings
 from app.dependencies import RoleChecker
+from app.utils.principals import Principal
+from app.utils.reference_cache import get_site_settings
 from app.schemas.settings import SettingsUpdate
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
@@ -14,16 +15,16 @@ require_admin = RoleChecker("super_admin")
 @router.get("/")
 def get_settings(db: Session = Depends(get_db)):
     """Get site settings."""
-    site = db.query(SiteSettings).first()
+    site = get_site_settings(db)
     if not site:
         return {"id": None, "enable_email_notifications": True}
-    return {"id": site.id, "enable_email_notifications": site.enable_email_notifications}
+    return dict(site)
 
 
 @router.put("/")
 def update_settings(
     data: SettingsUpdate,
-    user: User = Depends(require_admin),
+    user: Principal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     """Update site settings."""
@@ -1,18 +1,27 @@
 from datetime import date, timedelta
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, run_db, use_read_replica
 from app.models.user import User
 from app.models.daily_card import DailyCard
 from app.models.halqa import Halqa
-from app.dependencies import RoleChecker
-from app.schemas.user import user_to_response
+from app.dependencies import RequestRoleChecker, RoleChecker, get_request_db
+from app.utils.principals import Principal
+from app.schemas.user import user_to_response, user_load_options
 from app.schemas.daily_card import DailyCardCreate, card_to_response
-from app.schemas.halqa import halqa_to_response
+from app.schemas.halqa import halqa_to_response, halqa_list_to_response
+from app.utils.leaderboard import build_leaderboard
+from app.utils.pagination import MAX_PAGE_SIZE, paginated_response
+from app.utils.rollups import record_card_write
+from app.utils.scores import empty_summary, summarize_range
 
 router = APIRouter(prefix="/api/supervisor", tags=["supervisor"])
 
 require_supervisor = RoleChecker("supervisor", "super_admin")
+# Same check for the hot endpoints that run on the request (possibly async) session
+require_supervisor_request = RequestRoleChecker("supervisor", "super_admin")
 
 
 def _resolve_halqa(user, db, halqa_id=None):
@@ -28,17 +37,26 @@ def _resolve_halqa(user, db, halqa_id=None):
             return halqa
         return None  # means "all halqas"
     # Regular supervisor
-    halqa = db.query(Halqa).filter_by(supervisor_id=user.id).first()
+    halqa = db.get(Halqa, user.supervised_halqa_id) if user.supervised_halqa_id else None
     if not halqa:
         raise HTTPException(404, detail="لا توجد حلقة مسندة إليك")
     return halqa
 
 
+def _members_query(db, halqa):
+    """Query active members for a halqa, or all active participants if halqa is None.
+
+    Relationships needed by user_to_response are eager-loaded.
+    """
+    query = db.query(User).options(*user_load_options())
+    if halqa:
+        return query.filter_by(halqa_id=halqa.id, status="active")
+    return query.filter_by(status="active", role="participant")
+
+
 def _get_members(db, halqa):
     """Get active members for a halqa, or all active participants if halqa is None."""
-    if halqa:
-        return db.query(User).filter_by(halqa_id=halqa.id, status="active").all()
-    return db.query(User).filter_by(status="active", role="participant").all()
+    return _members_query(db, halqa).all()
 
 
 def _verify_member_access(user, member_id, db):
@@ -48,61 +66,86 @@ def _verify_member_access(user, member_id, db):
         raise HTTPException(404, detail="المشارك غير موجود")
     if user.role == "super_admin":
         return member
-    halqa = db.query(Halqa).filter_by(supervisor_id=user.id).first()
-    if not halqa or member.halqa_id != halqa.id:
+    if not user.supervised_halqa_id or member.halqa_id != user.supervised_halqa_id:
         raise HTTPException(403, detail="المشارك ليس في حلقتك")
     return member
 
 
 @router.get("/halqas")
 def get_all_halqas(
-    user: User = Depends(require_supervisor),
+    submitted_today: bool = Query(False),
+    user: Principal = Depends(require_supervisor),
     db: Session = Depends(get_db),
 ):
     """Get halqas available to this user. Super admin sees all, supervisor sees own."""
-    if user.role == "super_admin":
-        halqas = db.query(Halqa).all()
-    else:
-        halqa = db.query(Halqa).filter_by(supervisor_id=user.id).first()
-        halqas = [halqa] if halqa else []
-    return {"halqas": [halqa_to_response(h) for h in halqas]}
+    criteria = []
+    if user.role != "super_admin":
+        criteria.append(Halqa.supervisor_id == user.id)
+    halqas = halqa_list_to_response(db, *criteria, submitted_today=submitted_today)
+    if user.role != "super_admin":
+        halqas = halqas[:1]
+    return {"halqas": halqas}
 
 
 @router.get("/members")
 def get_halqa_members(
     halqa_id: int = Query(None),
-    user: User = Depends(require_supervisor),
+    limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    with_total: bool = Query(False),
+    user: Principal = Depends(require_supervisor),
     db: Session = Depends(get_db),
 ):
-    """Get members. Super admin can filter by halqa_id or see all."""
+    """Get members. Super admin can filter by halqa_id or see all.
+
+    Passing `limit` or `cursor` switches to keyset pagination (oldest first).
+    """
     halqa = _resolve_halqa(user, db, halqa_id)
-    members = _get_members(db, halqa)
-    return {
-        "halqa": halqa_to_response(halqa) if halqa else None,
-        "members": [user_to_response(m) for m in members],
-    }
+    response = {"halqa": halqa_to_response(halqa) if halqa else None}
+
+    if limit is None and cursor is None:
+        members = _get_members(db, halqa)
+        response["members"] = [user_to_response(m) for m in members]
+        return response
+    response.update(paginated_response(
+        _members_query(db, halqa), [User.created_at, User.id], "members", user_to_response,
+        limit, cursor, with_total, descending=False,
+    ))
+    return response
 
 
 @router.get("/member/{member_id}/cards")
 def get_member_cards(
     member_id: int,
-    user: User = Depends(require_supervisor),
+    limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    with_total: bool = Query(False),
+    user: Principal = Depends(require_supervisor),
     db: Session = Depends(get_db),
 ):
-    """Get all cards for a specific member."""
+    """Get all cards for a specific member.
+
+    Passing `limit` or `cursor` switches to keyset pagination (latest first).
+    """
     member = _verify_member_access(user, member_id, db)
-    cards = db.query(DailyCard).filter_by(user_id=member_id).order_by(DailyCard.date.desc()).all()
-    return {
-        "member": user_to_response(member),
-        "cards": [card_to_response(c) for c in cards],
-    }
+    query = db.query(DailyCard).filter_by(user_id=member_id)
+    response = {"member": user_to_response(member)}
+
+    if limit is None and cursor is None:
+        cards = query.order_by(DailyCard.date.desc()).all()
+        response["cards"] = [card_to_response(c) for c in cards]
+        return response
+    response.update(paginated_response(
+        query, [DailyCard.date, DailyCard.id], "cards", card_to_response, limit, cursor, with_total,
+    ))
+    return response
 
 
 @router.get("/member/{member_id}/card/{card_date}")
 def get_member_card_detail(
     member_id: int,
     card_date: str,
-    user: User = Depends(require_supervisor),
+    user: Principal = Depends(require_supervisor),
     db: Session = Depends(get_db),
 ):
     """Get a specific daily card for a member (full detail)."""
@@ -121,7 +164,7 @@ def update_member_card(
     member_id: int,
     card_date: str,
     data: DailyCardCreate,
-    user: User = Depends(require_supervisor),
+    user: Principal = Depends(require_supervisor),
     db: Session = Depends(get_db),
 ):
     """Create or update a daily card for a member."""
@@ -132,7 +175,10 @@ def update_member_card(
         raise HTTPException(400, detail="لا يمكن إدخال بطاقة بتاريخ مستقبلي")
 
     card = db.query(DailyCard).filter_by(user_id=member_id, date=target_date).first()
-    if not card:
+    previous_total = None
+    if card:
+        previous_total = card.total_score
+    else:
         card = DailyCard(user_id=member_id, date=target_date)
         db.add(card)
 
@@ -140,65 +186,75 @@ def update_member_card(
         setattr(card, field, getattr(data, field, 0))
     card.extra_work_description = data.extra_work_description
 
+    record_card_write(db, member.id, card, previous_total)
     db.commit()
     db.refresh(card)
     return {"message": "تم تحديث بطاقة المشارك", "card": card_to_response(card)}
 
 
 @router.get("/leaderboard")
-def get_leaderboard(
+async def get_leaderboard(
     halqa_id: int = Query(None),
-    user: User = Depends(require_supervisor),
-    db: Session = Depends(get_db),
+    limit: int = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    around: int = Query(None),
+    window: int = Query(5, ge=0),
+    user: Principal = Depends(require_supervisor_request),
+    db: Session | AsyncSession = Depends(get_request_db),
 ):
-    """Get leaderboard. Super admin can filter by halqa or see all."""
-    halqa = _resolve_halqa(user, db, halqa_id)
-    members = _get_members(db, halqa)
+    """Get leaderboard. Super admin can filter by halqa or see all.
+
+    Supports limit/offset paging, or `around=<member id>` to get the
+    `window` entries above and below that member.
+    """
+    return await run_db(db, _leaderboard, user, halqa_id, limit, offset, around, window)
 
-    leaderboard = []
-    for m in members:
-        cards = db.query(DailyCard).filter_by(user_id=m.id).all()
-        total = sum(c.total_score for c in cards)
-        max_total = sum(c.max_score for c in cards) if cards else 0
-        pct = round((total / max_total) * 100, 1) if max_total > 0 else 0
-        leaderboard.append({
-            "user_id": m.id,
-            "full_name": m.full_name,
-            "halqa_name": m.halqa.name if m.halqa else "-",
-            "total_score": total,
-            "percentage": pct,
-            "cards_count": len(cards),
-        })
 
-    leaderboard.sort(key=lambda x: x["total_score"], reverse=True)
-    for i, entry in enumerate(leaderboard):
-        entry["rank"] = i + 1
+def _leaderboard(db: Session, user: Principal, halqa_id, limit, offset, around, window):
+    use_read_replica(db, user.id)
+    halqa = _resolve_halqa(user, db, halqa_id)
+    leaderboard, total = build_leaderboard(
+        db, halqa_id=halqa.id if halqa else None,
+        limit=limit, offset=offset, around=around, window=window,
+    )
 
     return {
         "halqa": halqa_to_response(halqa) if halqa else None,
         "leaderboard": leaderboard,
+        "total": total,
     }
 
 
 @router.get("/daily-summary")
-def get_daily_summary(
+async def get_daily_summary(
     halqa_id: int = Query(None),
-    user: User = Depends(require_supervisor),
-    db: Session = Depends(get_db),
+    user: Principal = Depends(require_supervisor_request),
+    db: Session | AsyncSession = Depends(get_request_db),
     date_param: str = Query(None, alias="date"),
 ):
     """Get daily submission summary. Super admin can filter by halqa."""
+    return await run_db(db, _daily_summary, user, halqa_id, date_param)
+
+
+def _daily_summary(db: Session, user: Principal, halqa_id, date_param):
     target_date_str = date_param or date.today().isoformat()
     target_date = date.fromisoformat(target_date_str)
 
     halqa = _resolve_halqa(user, db, halqa_id)
-    members = _get_members(db, halqa)
+
+    # One LEFT JOIN: every member with their card for the day (or None)
+    rows = (
+        _members_query(db, halqa)
+        .add_entity(DailyCard)
+        .outerjoin(DailyCard, and_(DailyCard.user_id == User.id, DailyCard.date == target_date))
+        .order_by(User.id)
+        .all()
+    )
 
     submitted = []
     not_submitted = []
 
-    for member in members:
-        card = db.query(DailyCard).filter_by(user_id=member.id, date=target_date).first()
+    for member, card in rows:
         if card:
             submitted.append({
                 "member": user_to_response(member),
@@ -214,7 +270,7 @@ def get_daily_summary(
         "not_submitted": not_submitted,
         "submitted_count": len(submitted),
         "not_submitted_count": len(not_submitted),
-        "total_members": len(members),
+        "total_members": len(rows),
     }
 
 
@@ -223,7 +279,7 @@ def get_range_summary(
     halqa_id: int = Query(None),
     date_from: str = Query(None),
     date_to: str = Query(None),
-    user: User = Depends(require_supervisor),
+    user: Principal = Depends(require_supervisor),
     db: Session = Depends(get_db),
 ):
     """Get summary for a custom date range."""
@@ -232,27 +288,21 @@ def get_range_summary(
     end = date.fromisoformat(date_to) if date_to else today
     total_days = (end - start).days + 1
 
+    use_read_replica(db, user.id)
     halqa = _resolve_halqa(user, db, halqa_id)
     members = _get_members(db, halqa)
     summary = []
 
-    for member in members:
-        cards = db.query(DailyCard).filter(
-            DailyCard.user_id == member.id,
-            DailyCard.date >= start,
-            DailyCard.date <= end,
-        ).all()
-
-        total = sum(c.total_score for c in cards)
-        max_total = sum(c.max_score for c in cards) if cards else 0
-        pct = round((total / max_total) * 100, 1) if max_total > 0 else 0
+    totals = summarize_range(db, [m.id for m in members], start, end)
 
+    for member in members:
+        stats = totals.get(member.id) or empty_summary()
         summary.append({
             "member": user_to_response(member),
-            "cards_submitted": len(cards),
+            "cards_submitted": stats["cards_count"],
             "total_days": total_days,
-            "total_score": total,
-            "percentage": pct,
+            "total_score": stats["total_score"],
+            "percentage": stats["percentage"],
         })
 
     summary.sort(key=lambda x: x["total_score"], reverse=True)
@@ -269,10 +319,11 @@ def get_range_summary(
 @router.get("/weekly-summary")
 def get_weekly_summary(
     halqa_id: int = Query(None),
-    user: User = Depends(require_supervisor),
+    user: Principal = Depends(require_supervisor),
     db: Session = Depends(get_db),
 ):
     """Get weekly summary. Super admin can filter by halqa."""
+    use_read_replica(db, user.id)
     halqa = _resolve_halqa(user, db, halqa_id)
 
     today = date.today()
@@ -281,22 +332,15 @@ def get_weekly_summary(
     members = _get_members(db, halqa)
     summary = []
 
-    for member in members:
-        cards = db.query(DailyCard).filter(
-            DailyCard.user_id == member.id,
-            DailyCard.date >= week_start,
-            DailyCard.date <= today,
-        ).all()
-
-        total = sum(c.total_score for c in cards)
-        max_total = sum(c.max_score for c in cards) if cards else 0
-        pct = round((total / max_total) * 100, 1) if max_total > 0 else 0
+    totals = summarize_range(db, [m.id for m in members], week_start, today)
 
+    for member in members:
+        stats = totals.get(member.id) or empty_summary()
         summary.append({
             "member": user_to_response(member),
-            "cards_submitted": len(cards),
-            "total_score": total,
-            "percentage": pct,
+            "cards_submitted": stats["cards_count"],
+            "total_score": stats["total_score"],
+            "percentage": stats["percentage"],
         })
 
     summary.sort(key=lambda x: x["total_score"], reverse=True)
@@ -0,0 +1,42 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class ExportRequest(BaseModel):
+    """Same filters as GET /api/admin/export."""
+
+    format: str = "csv"
+    gender: Optional[str] = None
+    halqa_id: Optional[int] = None
+    supervisor: Optional[str] = None
+    member: Optional[str] = None
+    min_pct: Optional[float] = None
+    max_pct: Optional[float] = None
+    period: str = "all"
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    sort_by: str = "score"
+    sort_order: str = "desc"
+
+
+def export_job_to_response(job) -> dict:
+    """Build export job response dict with progress and download link.
+
+    rows_total is only known once every row has been streamed, so a running
+    job reports rows_written and no progress percentage.
+    """
+    progress = 100 if job.status == "done" else None
+
+    return {
+        "id": job.id,
+        "format": job.format,
+        "status": job.status,
+        "rows_total": job.rows_total,
+        "rows_written": job.rows_written,
+        "progress": progress,
+        "error": job.error,
+        "download_url": f"/api/admin/exports/{job.id}/download" if job.status == "done" else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "expires_at": job.expires_at.isoformat() if job.expires_at else None,
+    }
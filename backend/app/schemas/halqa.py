@@ -1,5 +1,11 @@
+from datetime import date
 from pydantic import BaseModel
 from typing import Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased, object_session
+from app.models.user import User
+from app.models.halqa import Halqa
+from app.models.daily_card import DailyCard
 
 
 class HalqaCreate(BaseModel):
@@ -16,13 +22,67 @@ class AssignMembers(BaseModel):
     user_ids: list[int] = []
 
 
-def halqa_to_response(halqa) -> dict:
-    """Build halqa response dict matching the frontend expected format."""
+def _halqa_dict(halqa, supervisor_name, member_count) -> dict:
     return {
         "id": halqa.id,
         "name": halqa.name,
         "supervisor_id": halqa.supervisor_id,
-        "supervisor_name": halqa.supervisor.full_name if halqa.supervisor else None,
-        "member_count": len([m for m in halqa.members if m.status == "active"]),
+        "supervisor_name": supervisor_name,
+        "member_count": member_count,
         "created_at": halqa.created_at.isoformat() if halqa.created_at else None,
     }
+
+
+def halqa_to_response(halqa) -> dict:
+    """Build halqa response dict matching the frontend expected format."""
+    member_count = (
+        object_session(halqa)
+        .query(func.count(User.id))
+        .filter(User.halqa_id == halqa.id, User.status == "active")
+        .scalar()
+    )
+    return _halqa_dict(halqa, halqa.supervisor.full_name if halqa.supervisor else None, member_count)
+
+
+def halqa_list_to_response(db, *criteria, submitted_today: bool = False) -> list[dict]:
+    """Build responses for a halqa listing from a single query.
+
+    Supervisor name and active member count are joined/grouped in SQL; no
+    members are loaded. With `submitted_today`, each entry also carries how
+    many of those active members have a card for today, counted in the same
+    grouped query so it is never more than `member_count`.
+    """
+    member_columns = [User.halqa_id, func.count(User.id).label("member_count")]
+    if submitted_today:
+        member_columns.append(func.count(DailyCard.id).label("submitted_today"))
+    members = select(*member_columns).where(User.status == "active")
+    if submitted_today:
+        # At most one card per member per day (unique_user_date)
+        members = members.outerjoin(
+            DailyCard, (DailyCard.user_id == User.id) & (DailyCard.date == date.today())
+        )
+    member_counts = members.group_by(User.halqa_id).subquery()
+
+    Supervisor = aliased(User)
+    columns = [
+        Halqa.id, Halqa.name, Halqa.supervisor_id, Halqa.created_at,
+        Supervisor.full_name.label("supervisor_name"),
+        func.coalesce(member_counts.c.member_count, 0).label("member_count"),
+    ]
+    if submitted_today:
+        columns.append(func.coalesce(member_counts.c.submitted_today, 0).label("submitted_today"))
+
+    query = (
+        db.query(*columns)
+        .outerjoin(Supervisor, Halqa.supervisor_id == Supervisor.id)
+        .outerjoin(member_counts, member_counts.c.halqa_id == Halqa.id)
+        .filter(*criteria)
+    )
+
+    responses = []
+    for row in query.order_by(Halqa.id).all():
+        data = _halqa_dict(row, row.supervisor_name, row.member_count)
+        if submitted_today:
+            data["submitted_today"] = row.submitted_today
+        responses.append(data)
+    return responses
@@ -0,0 +1,17 @@
+import json
+
+
+def import_job_to_response(job) -> dict:
+    """Build import job response dict."""
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "format": job.format,
+        "status": job.status,
+        "rows_processed": max(job.last_row - 1, 0),
+        "imported": job.imported,
+        "errors": json.loads(job.errors or "[]"),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
@@ -0,0 +1,11 @@
+from sqlalchemy.orm import raiseload
+from app.config import settings
+
+
+def strict_loading_options() -> list:
+    """Query options for list responses that read no relationships.
+
+    With STRICT_EAGER_LOADING enabled, every relationship of the queried
+    entity raises on access instead of silently issuing a lazy load per row.
+    """
+    return [raiseload("*")] if settings.STRICT_EAGER_LOADING else []
@@ -1,5 +1,8 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
+from sqlalchemy.orm import object_session
+from app.schemas.loading import strict_loading_options
+from app.utils.reference_cache import halqa_directory
 
 
 # --- Request Schemas ---
@@ -74,9 +77,19 @@ class RejectRegistration(BaseModel):
 
 # --- Response Helpers ---
 
+def user_load_options() -> list:
+    """Query options for users passed to user_to_response, which reads no relationships."""
+    return strict_loading_options()
+
 
 def user_to_response(user) -> dict:
-    """Build user response dict matching the frontend expected format."""
+    """Build user response dict matching the frontend expected format.
+
+    Halqa and supervisor names come from the cached halqa directory, so no
+    relationships are loaded.
+    """
+    directory = halqa_directory(object_session(user))
+    halqa = directory["halqas"].get(user.halqa_id)
     data = {
         "id": user.id,
         "full_name": user.full_name,
@@ -90,13 +103,14 @@ def user_to_response(user) -> dict:
         "role": user.role,
         "rejection_note": user.rejection_note,
         "halqa_id": user.halqa_id,
-        "halqa_name": user.halqa.name if user.halqa else None,
+        "halqa_name": halqa[0] if halqa else None,
         "created_at": user.created_at.isoformat() if user.created_at else None,
         "updated_at": user.updated_at.isoformat() if user.updated_at else None,
     }
-    if user.supervised_halqa:
-        data["supervised_halqa_name"] = user.supervised_halqa.name
-    if user.halqa and user.halqa.supervisor:
-        data["supervisor_name"] = user.halqa.supervisor.full_name
-        data["supervisor_phone"] = user.halqa.supervisor.phone
+    supervised_halqa_name = directory["supervised"].get(user.id)
+    if supervised_halqa_name is not None:
+        data["supervised_halqa_name"] = supervised_halqa_name
+    if halqa and halqa[1] is not None:
+        data["supervisor_name"] = halqa[1]
+        data["supervisor_phone"] = halqa[2]
     return data
@@ -0,0 +1,141 @@
+from datetime import date, timedelta
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session, aliased
+from app.models.user import User
+from app.models.daily_card import DailyCard
+from app.models.halqa import Halqa
+from app.models.rollup import UserScoreTotal
+from app.utils.scores import CARD_MAX_SCORE, card_total_expr, percentage, percentage_filter, percentage_ratio_expr
+from app.utils.search import search_filter
+
+
+def analytics_query(
+    db: Session,
+    gender: str = None,
+    halqa_id: int = None,
+    supervisor: str = None,
+    member: str = None,
+    min_pct: float = None,
+    max_pct: float = None,
+    period: str = "all",
+    date_from: str = None,
+    date_to: str = None,
+    sort_by: str = "score",
+    sort_order: str = "desc",
+):
+    """Build the ordered analytics query shared by analytics and export.
+
+    Everything (totals, percentage filter, sort and rank) is computed by a
+    single query over users, halqas, supervisors and either the per-user
+    rollup (no date range) or the daily cards in the range.
+    """
+    # Date range
+    today = date.today()
+    start_date = None
+    end_date = None
+
+    if date_from:
+        start_date = date.fromisoformat(date_from)
+    elif period == "weekly":
+        start_date = today - timedelta(days=today.weekday())
+    elif period == "monthly":
+        start_date = today.replace(day=1)
+
+    if date_to:
+        end_date = date.fromisoformat(date_to)
+
+    # All-time totals are read pre-summed from the rollup; date ranges scan the cards
+    use_rollup = not start_date and not end_date
+    if use_rollup:
+        total = func.coalesce(UserScoreTotal.total_score, 0)
+        cards_count = func.coalesce(UserScoreTotal.cards_count, 0)
+    else:
+        # Date filters belong to the join so users without cards are kept
+        card_join = [DailyCard.user_id == User.id]
+        if start_date:
+            card_join.append(DailyCard.date >= start_date)
+        if end_date:
+            card_join.append(DailyCard.date <= end_date)
+        total = func.coalesce(func.sum(card_total_expr()), 0)
+        cards_count = func.count(DailyCard.user_id)
+    pct = percentage_ratio_expr(total, cards_count)
+
+    if sort_by == "name":
+        sort_col = User.full_name
+    else:
+        sort_col = total
+    order = [sort_col.desc() if sort_order == "desc" else sort_col.asc(), User.id]
+
+    Supervisor = aliased(User)
+    query = (
+        db.query(
+            User.id,
+            User.full_name,
+            User.gender,
+            Halqa.name.label("halqa_name"),
+            Supervisor.full_name.label("supervisor_name"),
+            total.label("total_score"),
+            cards_count.label("cards_count"),
+            func.row_number().over(order_by=order).label("rank"),
+        )
+        .outerjoin(Halqa, User.halqa_id == Halqa.id)
+        .outerjoin(Supervisor, Halqa.supervisor_id == Supervisor.id)
+        .filter(User.status == "active")
+    )
+    if use_rollup:
+        query = query.outerjoin(UserScoreTotal, UserScoreTotal.user_id == User.id)
+    else:
+        query = query.outerjoin(DailyCard, and_(*card_join))
+
+    if gender:
+        query = query.filter(User.gender == gender)
+    if halqa_id:
+        query = query.filter(User.halqa_id == halqa_id)
+    if member:
+        query = query.filter(search_filter(User.search_name, member))
+    if supervisor:
+        # A supervisor name that matches no halqa leaves the results unfiltered
+        FilterHalqa = aliased(Halqa)
+        FilterSupervisor = aliased(User)
+        supervised = (
+            select(FilterHalqa.id)
+            .join(FilterSupervisor, FilterHalqa.supervisor_id == FilterSupervisor.id)
+            .where(search_filter(FilterSupervisor.search_name, supervisor))
+        )
+        query = query.filter(or_(User.halqa_id.in_(supervised), ~supervised.exists()))
+
+    pct_conditions = percentage_filter(pct, min_pct, max_pct)
+
+    if use_rollup:
+        query = query.filter(*pct_conditions)
+    else:
+        query = query.group_by(User.id, Halqa.id, Supervisor.id).having(*pct_conditions)
+
+    return query.order_by(*order)
+
+
+def analytics_row_to_result(row) -> dict:
+    max_total = row.cards_count * CARD_MAX_SCORE
+    return {
+        "user_id": row.id,
+        "full_name": row.full_name,
+        "gender": row.gender,
+        "halqa_name": row.halqa_name or "بدون حلقة",
+        "supervisor_name": row.supervisor_name or "-",
+        "total_score": row.total_score,
+        "max_score": max_total,
+        "percentage": percentage(row.total_score, max_total),
+        "cards_count": row.cards_count,
+        "rank": row.rank,
+    }
+
+
+def build_analytics_results(db: Session, **filters):
+    """Shared helper for analytics and export."""
+    return [analytics_row_to_result(row) for row in analytics_query(db, **filters).all()]
+
+
+def iter_analytics_results(db: Session, batch_size: int = 1000, **filters):
+    """Yield analytics results in batches from a server-side cursor."""
+    for row in analytics_query(db, **filters).yield_per(batch_size):
+        yield analytics_row_to_result(row)
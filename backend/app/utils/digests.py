@@ -0,0 +1,212 @@
+import threading
+from datetime import date, timedelta
+from html import escape
+from string import Template
+from sqlalchemy import and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, reporting_session
+from app.models.user import User
+from app.models.daily_card import DailyCard
+from app.models.digest_run import DigestRun
+from app.utils.email import mail_enabled, queue_email
+from app.utils.reference_cache import get_site_settings
+from app.utils.scores import CARD_MAX_SCORE, card_total_expr, empty_summary, percentage
+
+# Templates are parsed once; only the per-recipient fields are substituted
+DAILY_REMINDER_SUBJECT = "تذكير: لم تسجّل بطاقة اليوم بعد"
+DAILY_REMINDER_TEMPLATE = Template("""
+    <div dir="rtl" style="font-family: Arial, sans-serif;">
+        <h2>السلام عليكم ${name}</h2>
+        <p>لم تسجّل بطاقتك الرمضانية ليوم ${date} بعد.</p>
+        <p>لا تنسَ تسجيل إنجازاتك قبل نهاية اليوم.</p>
+    </div>
+""")
+
+WEEKLY_SUMMARY_SUBJECT = "ملخص أسبوعك في البرنامج الرمضاني"
+WEEKLY_SUMMARY_TEMPLATE = Template("""
+    <div dir="rtl" style="font-family: Arial, sans-serif;">
+        <h2>السلام عليكم ${name}</h2>
+        <p>ملخص أسبوعك من ${week_start} إلى ${week_end}:</p>
+        <p><strong>البطاقات المسجلة:</strong> ${cards_submitted} من ${total_days}</p>
+        <p><strong>مجموع النقاط:</strong> ${total_score}</p>
+        <p><strong>النسبة:</strong> ${percentage}%</p>
+    </div>
+""")
+
+def notifications_enabled(db: Session) -> bool:
+    """Mail is configured and email notifications are switched on."""
+    if not (mail_enabled() and settings.ENABLE_EMAIL_NOTIFICATIONS):
+        return False
+    site = get_site_settings(db)
+    return site is None or bool(site["enable_email_notifications"])
+
+
+def _active_participants(db: Session):
+    return db.query(User.id, User.full_name, User.email).filter(
+        User.status == "active", User.role == "participant"
+    )
+
+
+def daily_reminder_recipients(db: Session, target_date: date) -> list:
+    """Active participants without a card for target_date (one anti-join)."""
+    has_card = (
+        db.query(DailyCard.id)
+        .filter(DailyCard.user_id == User.id, DailyCard.date == target_date)
+        .exists()
+    )
+    return [(name, email) for _, name, email in _active_participants(db).filter(~has_card).order_by(User.id)]
+
+
+def weekly_summary_recipients(db: Session, week_start: date, week_end: date) -> list:
+    """(name, email, summary) for active participants; the same totals as the supervisor weekly summary.
+
+    One grouped query: the participants outer-joined to their cards in the week.
+    """
+    rows = (
+        _active_participants(db)
+        .outerjoin(DailyCard, and_(
+            DailyCard.user_id == User.id, DailyCard.date >= week_start, DailyCard.date <= week_end,
+        ))
+        .add_columns(func.sum(card_total_expr()), func.count(DailyCard.id))
+        .group_by(User.id, User.full_name, User.email)
+        .order_by(User.id)
+    )
+    recipients = []
+    for _, name, email, total, cards_count in rows:
+        summary = empty_summary()
+        if cards_count:
+            max_total = cards_count * CARD_MAX_SCORE
+            summary = {
+                "total_score": total,
+                "max_score": max_total,
+                "percentage": percentage(total, max_total),
+                "cards_count": cards_count,
+            }
+        recipients.append((name, email, summary))
+    return recipients
+
+
+def _queue_digest(kind: str, run_date: date, messages) -> dict | None:
+    """Queue (to, subject, html) tuples in the email outbox with the digest's run record.
+
+    Both commit in one transaction, so a (kind, run_date) digest is queued
+    at most once however many workers or cron jobs start it. None when it
+    was already queued.
+    """
+    db = SessionLocal()
+    try:
+        run = DigestRun(kind=kind, run_date=run_date)
+        db.add(run)
+        db.flush()
+        for to, subject, html in messages:
+            queue_email(db, to, subject, html)
+            run.recipients += 1
+        db.commit()
+        return {"recipients": run.recipients, "queued": run.recipients}
+    except IntegrityError:
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+def digest_queued(kind: str, run_date: date = None) -> bool:
+    """A digest of this kind has already been queued for run_date (default today)."""
+    db = SessionLocal()
+    try:
+        return db.get(DigestRun, (kind, run_date or date.today())) is not None
+    finally:
+        db.close()
+
+
+def send_daily_reminders(target_date: date = None) -> dict | None:
+    """Queue reminders for active participants who have not submitted today's card.
+
+    None when the reminders for target_date were already queued.
+    """
+    target_date = target_date or date.today()
+    db = reporting_session()
+    try:
+        if not notifications_enabled(db):
+            return {"recipients": 0, "queued": 0}
+        recipients = daily_reminder_recipients(db, target_date)
+    finally:
+        db.close()
+
+    day = target_date.isoformat()
+    messages = (
+        (email, DAILY_REMINDER_SUBJECT, DAILY_REMINDER_TEMPLATE.substitute(name=escape(name), date=day))
+        for name, email in recipients
+    )
+    return _queue_digest("daily", target_date, messages)
+
+
+def send_weekly_summaries(week_end: date = None) -> dict | None:
+    """Queue each active participant's progress for the week ending week_end.
+
+    None when the summaries for week_end were already queued.
+    """
+    week_end = week_end or date.today()
+    week_start = week_end - timedelta(days=week_end.weekday())
+    db = reporting_session()
+    try:
+        if not notifications_enabled(db):
+            return {"recipients": 0, "queued": 0}
+        recipients = weekly_summary_recipients(db, week_start, week_end)
+    finally:
+        db.close()
+
+    fields = {
+        "week_start": week_start.isoformat(),
+        "week_end": week_end.isoformat(),
+        "total_days": (week_end - week_start).days + 1,
+    }
+    messages = (
+        (
+            email,
+            WEEKLY_SUMMARY_SUBJECT,
+            WEEKLY_SUMMARY_TEMPLATE.substitute(
+                fields,
+                name=escape(name),
+                cards_submitted=stats["cards_count"],
+                total_score=round(float(stats["total_score"]), 1),
+                percentage=float(stats["percentage"]),
+            ),
+        )
+        for name, email, stats in recipients
+    )
+    return _queue_digest("weekly", week_end, messages)
+
+
+DIGESTS = {
+    "daily": send_daily_reminders,
+    "weekly": send_weekly_summaries,
+}
+
+
+def run_digest(kind: str) -> dict | None:
+    """Run a digest for today unless it was already queued (then None)."""
+    return DIGESTS[kind]()
+
+
+def start_digest(kind: str) -> bool:
+    """Run today's digest in a background thread. False when it was already queued."""
+    if digest_queued(kind):
+        return False
+
+    def run():
+        result = DIGESTS[kind]()
+        print(f"{kind} digest: {result if result is not None else 'already queued'}")
+
+    threading.Thread(target=run, name=f"digest-{kind}", daemon=True).start()
+    return True
+
+
+if __name__ == "__main__":
+    # python -m app.utils.digests daily|weekly  (e.g. from cron)
+    import sys
+
+    kind = sys.argv[1] if len(sys.argv) > 1 else "daily"
+    print(f"{kind} digest: {run_digest(kind)}")
@@ -1,32 +1,82 @@
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from sqlalchemy.orm import Session
 from app.config import settings
+from app.models.email_outbox import EmailOutbox
 
+# Set when a message is queued so the outbox worker does not wait a full poll interval
+outbox_wakeup = threading.Event()
 
-def _send_email(to: str, subject: str, html_body: str):
-    """Send email via SMTP."""
-    if not settings.MAIL_USERNAME or not settings.MAIL_PASSWORD:
-        return
 
+def mail_enabled() -> bool:
+    return bool(settings.MAIL_USERNAME and settings.MAIL_PASSWORD)
+
+
+def _build_message(to: str, subject: str, html_body: str) -> MIMEMultipart:
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
     msg["From"] = settings.MAIL_USERNAME
     msg["To"] = to
     msg.attach(MIMEText(html_body, "html", "utf-8"))
+    return msg
+
+
+class SMTPSession:
+    """One authenticated SMTP connection reused for many messages.
+
+    Connects on the first send and reconnects once if the server dropped
+    the connection in between.
+    """
+
+    def __init__(self):
+        self.server = None
+
+    def _connect(self):
+        server = smtplib.SMTP(settings.MAIL_SERVER, settings.MAIL_PORT, timeout=settings.MAIL_TIMEOUT)
+        if settings.MAIL_USE_TLS:
+            server.starttls()
+        server.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
+        self.server = server
+
+    def send(self, to: str, subject: str, html_body: str):
+        msg = _build_message(to, subject, html_body)
+        if self.server is None:
+            self._connect()
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._connect()
+            self.server.send_message(msg)
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 
-    try:
-        with smtplib.SMTP(settings.MAIL_SERVER, settings.MAIL_PORT) as server:
-            if settings.MAIL_USE_TLS:
-                server.starttls()
-            server.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
-            server.send_message(msg)
-    except Exception as e:
-        print(f"Failed to send email: {e}")
+def queue_email(db: Session, to: str, subject: str, html_body: str):
+    """Add an email to the outbox; it is sent once the caller commits."""
+    if not mail_enabled():
+        return None
+    message = EmailOutbox(to_address=to, subject=subject, html_body=html_body)
+    db.add(message)
+    outbox_wakeup.set()
+    return message
 
 
-def send_new_registration_email(user_data: dict):
-    """Send email notification to super admin about new registration."""
+def send_new_registration_email(db: Session, user_data: dict):
+    """Queue email notification to super admin about new registration."""
     admin_email = settings.SUPER_ADMIN_EMAIL
     if not admin_email:
         return
@@ -45,11 +95,11 @@ def send_new_registration_email(user_data: dict):
         <p>يرجى مراجعة الطلب من لوحة التحكم.</p>
     </div>
     """
-    _send_email(admin_email, "طلب تسجيل جديد في البرنامج الرمضاني", html)
+    queue_email(db, admin_email, "طلب تسجيل جديد في البرنامج الرمضاني", html)
 
 
-def send_password_reset_email(user_email: str, reset_token: str):
-    """Send password reset email."""
+def send_password_reset_email(db: Session, user_email: str, reset_token: str):
+    """Queue password reset email."""
     html = f"""
     <div dir="rtl" style="font-family: Arial, sans-serif;">
         <h2>إعادة تعيين كلمة المرور</h2>
@@ -58,4 +108,4 @@ def send_password_reset_email(user_email: str, reset_token: str):
         <p>إذا لم تطلب ذلك، يرجى تجاهل هذا البريد.</p>
     </div>
     """
-    _send_email(user_email, "إعادة تعيين كلمة المرور", html)
+    queue_email(db, user_email, "إعادة تعيين كلمة المرور", html)
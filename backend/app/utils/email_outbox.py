@@ -0,0 +1,141 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.email_outbox import EmailOutbox
+from app.utils.email import SMTPSession, mail_enabled, outbox_wakeup
+
+_worker = None
+_worker_stop = threading.Event()
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: base, 2x base, 4x base, ... capped at one day."""
+    return timedelta(seconds=min(settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), 86400))
+
+
+def _claim_due_emails(db: Session) -> list:
+    """Mark one batch of due messages `sending` under a lease and commit.
+
+    Rows are locked (SKIP LOCKED on PostgreSQL) only while they are claimed,
+    so several workers never claim the same message and no lock is held
+    during the SMTP send. A `sending` row whose lease ran out (its worker
+    died mid-send) is due again.
+    """
+    now = datetime.utcnow()
+    messages = (
+        db.query(EmailOutbox)
+        .filter(EmailOutbox.status.in_(("pending", "sending")), EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(settings.EMAIL_OUTBOX_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    claimed = []
+    for message in messages:
+        if message.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+            message.status = "failed"
+            message.last_error = message.last_error or "send lease expired"
+            continue
+        message.status = "sending"
+        message.attempts += 1
+        message.next_attempt_at = now + timedelta(seconds=settings.EMAIL_SEND_LEASE_SECONDS)
+        claimed.append((message.id, message.attempts, message.to_address, message.subject, message.html_body))
+    db.commit()
+    return claimed
+
+
+def _finish(db: Session, message_id: int, attempts: int, **values):
+    """Record a send outcome, unless the lease expired and another worker claimed the row."""
+    db.query(EmailOutbox).filter(
+        EmailOutbox.id == message_id, EmailOutbox.status == "sending", EmailOutbox.attempts == attempts,
+    ).update(values, synchronize_session=False)
+    db.commit()
+
+
+def deliver_due_emails(db: Session, smtp: SMTPSession) -> int:
+    """Claim one batch of due outbox messages and send them over `smtp`. Returns the batch size.
+
+    Sends are paced at EMAIL_RATE_PER_SECOND. Each outcome is committed as
+    soon as the message is sent, so a crash re-sends at most the message in
+    flight (after its lease expires).
+    """
+    claimed = _claim_due_emails(db)
+    interval = 1 / settings.EMAIL_RATE_PER_SECOND if settings.EMAIL_RATE_PER_SECOND > 0 else 0
+    next_send = time.monotonic()
+    for message_id, attempts, to_address, subject, html_body in claimed:
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_send = max(next_send, time.monotonic()) + interval
+        try:
+            smtp.send(to_address, subject, html_body)
+        except Exception as e:
+            # Drop the connection; the next message reconnects
+            smtp.close()
+            if attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                _finish(db, message_id, attempts, status="failed", last_error=str(e))
+            else:
+                _finish(
+                    db, message_id, attempts, status="pending", last_error=str(e),
+                    next_attempt_at=datetime.utcnow() + _retry_delay(attempts),
+                )
+            continue
+        _finish(db, message_id, attempts, status="sent", sent_at=datetime.utcnow(), last_error=None)
+    return len(claimed)
+
+
+def sweep_old_emails(db: Session) -> int:
+    """Delete sent and failed messages older than EMAIL_OUTBOX_RETENTION_DAYS."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS)
+    deleted = db.query(EmailOutbox).filter(
+        EmailOutbox.status.in_(("sent", "failed")), EmailOutbox.created_at < cutoff,
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def _worker_loop():
+    smtp = SMTPSession()
+    last_sweep = 0.0
+    try:
+        while not _worker_stop.is_set():
+            outbox_wakeup.clear()
+            db = SessionLocal()
+            try:
+                # Keep the SMTP session open while full batches keep coming
+                while deliver_due_emails(db, smtp) >= settings.EMAIL_OUTBOX_BATCH_SIZE:
+                    if _worker_stop.is_set():
+                        break
+                if time.monotonic() - last_sweep >= settings.EMAIL_OUTBOX_SWEEP_INTERVAL:
+                    last_sweep = time.monotonic()
+                    sweep_old_emails(db)
+            except Exception as e:
+                db.rollback()
+                print(f"Email outbox worker error: {e}")
+            finally:
+                db.close()
+            if not outbox_wakeup.wait(settings.EMAIL_OUTBOX_POLL_SECONDS):
+                # Nothing queued for a whole interval: release the SMTP connection
+                smtp.close()
+    finally:
+        smtp.close()
+
+
+def start_outbox_worker():
+    """Startup: start the background sender (only when mail is configured)."""
+    global _worker
+    if not mail_enabled():
+        return
+    if _worker is None or not _worker.is_alive():
+        _worker_stop.clear()
+        _worker = threading.Thread(target=_worker_loop, name="email-outbox", daemon=True)
+        _worker.start()
+
+
+def stop_outbox_worker():
+    """Shutdown: stop the sender after its current batch."""
+    _worker_stop.set()
+    outbox_wakeup.set()
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.export_job import ExportJob
+from app.utils.exports import stream_csv_export, stream_xlsx_export
+from app.utils.workers import worker_id
+
+ACTIVE_STATUSES = ("pending", "running")
+
+_executor = ThreadPoolExecutor(max_workers=settings.EXPORT_WORKERS, thread_name_prefix="export")
+_sweeper = None
+_sweeper_stop = threading.Event()
+
+
+def _dedup_key(format: str, filters: dict) -> str:
+    payload = json.dumps({"format": format, "filters": filters}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def submit_export(db: Session, format: str, filters: dict, user_id: int) -> ExportJob:
+    """Queue an export job, or return the active job for identical filters.
+
+    Raises 429 when EXPORT_MAX_ACTIVE_JOBS jobs are already pending/running.
+    Identical requests racing on different workers are settled by the unique
+    active_key: the losing insert returns the winner's job.
+    """
+    key = _dedup_key(format, filters)
+    job = db.query(ExportJob).filter(ExportJob.active_key == key).first()
+    if job:
+        return job
+
+    active = db.query(ExportJob).filter(ExportJob.status.in_(ACTIVE_STATUSES)).count()
+    if active >= settings.EXPORT_MAX_ACTIVE_JOBS:
+        raise HTTPException(429, detail="يوجد عدد كبير من عمليات التصدير الجارية، حاول لاحقاً")
+
+    job = ExportJob(
+        id=uuid.uuid4().hex,
+        dedup_key=key,
+        active_key=key,
+        format=format,
+        filters=json.dumps(filters, ensure_ascii=False),
+        status="pending",
+        created_by=user_id,
+        owner=worker_id(),
+        heartbeat_at=datetime.utcnow(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing = db.query(ExportJob).filter(ExportJob.active_key == key).first()
+        if existing is None:
+            raise
+        return existing
+
+    _executor.submit(_run_job, job.id)
+    return job
+
+
+def _expires_at(finished_at: datetime) -> datetime:
+    """Finished jobs, done or failed, are swept EXPORT_TTL_SECONDS after they finish."""
+    return finished_at + timedelta(seconds=settings.EXPORT_TTL_SECONDS)
+
+
+def _artifact_paths(job_id: str, format: str) -> list:
+    """The finished artifact and its in-progress .part file (left behind by a dead worker)."""
+    ext = "xlsx" if format == "xlsx" else "csv"
+    path = os.path.join(settings.EXPORT_DIR, f"{job_id}.{ext}")
+    return [path, path + ".part"]
+
+
+def _update_job(job_id: str, **values) -> bool:
+    """Update a job this worker still owns; False once it was failed as orphaned."""
+    if values.get("status") in ("done", "failed"):
+        values["active_key"] = None
+        values["expires_at"] = _expires_at(values["finished_at"])
+    db = SessionLocal()
+    try:
+        updated = (
+            db.query(ExportJob)
+            .filter(
+                ExportJob.id == job_id,
+                ExportJob.owner == worker_id(),
+                ExportJob.status.in_(ACTIVE_STATUSES),
+            )
+            .update(values, synchronize_session=False)
+        )
+        db.commit()
+        return updated == 1
+    finally:
+        db.close()
+
+
+def _run_job(job_id: str):
+    """Worker: write the export artifact to EXPORT_DIR and record progress."""
+    db = SessionLocal()
+    try:
+        job = db.get(ExportJob, job_id)
+        if not job or job.status != "pending":
+            return
+        filters = json.loads(job.filters)
+        format = job.format
+        user_id = job.created_by
+    finally:
+        db.close()
+    if not _update_job(job_id, status="running", heartbeat_at=datetime.utcnow()):
+        return
+
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+    path, partial = _artifact_paths(job_id, format)
+    streamed = 0
+
+    def on_progress(rows_written):
+        nonlocal streamed
+        streamed = rows_written
+        _update_job(job_id, rows_written=rows_written)
+
+    try:
+        writer = stream_xlsx_export if format == "xlsx" else stream_csv_export
+        with open(partial, "wb") as f:
+            for chunk in writer(filters, on_progress=on_progress, user_id=user_id):
+                f.write(chunk)
+        os.replace(partial, path)
+    except Exception as e:
+        if os.path.exists(partial):
+            os.remove(partial)
+        _update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+        print(f"Export job {job_id} failed: {e}")
+        return
+
+    # The total is known once every row has been streamed; no separate COUNT query
+    finished = _update_job(
+        job_id, status="done", file_path=path, rows_total=streamed, finished_at=datetime.utcnow(),
+    )
+    if not finished:
+        # Failed as orphaned meanwhile; nothing will serve the file
+        os.remove(path)
+
+
+def sweep_expired_exports(db: Session) -> int:
+    """Delete expired jobs, done or failed, with any artifact or partial file. Returns the count.
+
+    Failed jobs from before failures were given an expiry are swept by finished_at.
+    """
+    now = datetime.utcnow()
+    expired = db.query(ExportJob).filter(or_(
+        ExportJob.expires_at <= now,
+        and_(
+            ExportJob.expires_at.is_(None),
+            ExportJob.status == "failed",
+            func.coalesce(ExportJob.finished_at, ExportJob.created_at)
+            <= now - timedelta(seconds=settings.EXPORT_TTL_SECONDS),
+        ),
+    )).all()
+    for job in expired:
+        for path in {job.file_path, *_artifact_paths(job.id, job.format)} - {None}:
+            if os.path.exists(path):
+                os.remove(path)
+        db.delete(job)
+    db.commit()
+    return len(expired)
+
+
+def heartbeat_exports(db: Session) -> int:
+    """Refresh heartbeat_at on the active jobs this worker owns."""
+    updated = (
+        db.query(ExportJob)
+        .filter(ExportJob.owner == worker_id(), ExportJob.status.in_(ACTIVE_STATUSES))
+        .update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return updated
+
+
+def fail_orphaned_exports(db: Session) -> int:
+    """Fail active jobs whose owner stopped heartbeating (its worker died or restarted).
+
+    They expire like any failed job, so the sweep removes their partial files.
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.EXPORT_STALE_SECONDS)
+    failed = (
+        db.query(ExportJob)
+        .filter(
+            ExportJob.status.in_(ACTIVE_STATUSES),
+            func.coalesce(ExportJob.heartbeat_at, ExportJob.created_at) < cutoff,
+        )
+        .update(
+            {
+                "status": "failed", "error": "interrupted", "active_key": None,
+                "finished_at": now, "expires_at": _expires_at(now),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return failed
+
+
+def _sweep_loop():
+    last_sweep = time.monotonic()
+    while not _sweeper_stop.wait(settings.EXPORT_HEARTBEAT_INTERVAL):
+        db = SessionLocal()
+        try:
+            heartbeat_exports(db)
+            fail_orphaned_exports(db)
+            if time.monotonic() - last_sweep >= settings.EXPORT_SWEEP_INTERVAL:
+                last_sweep = time.monotonic()
+                sweep_expired_exports(db)
+        except Exception as e:
+            print(f"Export sweep failed: {e}")
+        finally:
+            db.close()
+
+
+def start_export_jobs():
+    """Startup: fail orphaned jobs and start the heartbeat/expiry sweeper.
+
+    Jobs of other live workers keep heartbeating and are left alone.
+    """
+    global _sweeper
+
+    db = SessionLocal()
+    try:
+        fail_orphaned_exports(db)
+        sweep_expired_exports(db)
+    finally:
+        db.close()
+
+    if _sweeper is None or not _sweeper.is_alive():
+        _sweeper_stop.clear()
+        _sweeper = threading.Thread(target=_sweep_loop, name="export-sweeper", daemon=True)
+        _sweeper.start()
+
+
+def stop_export_jobs():
+    """Shutdown: stop the sweeper; running exports stop heartbeating and are failed as orphans."""
+    _sweeper_stop.set()
@@ -0,0 +1,103 @@
+import io
+from app.database import reporting_session
+from app.utils.analytics import iter_analytics_results
+
+EXPORT_HEADERS = [
+    "الترتيب", "الاسم", "الجنس", "الحلقة", "المشرف",
+    "مجموع النقاط", "الحد الأعلى", "عدد البطاقات", "النسبة %",
+]
+_GENDER_LABELS = {"male": "ذكر", "female": "أنثى"}
+
+# Flush the CSV buffer / read the XLSX spool file in chunks of this size
+_EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Report progress to on_progress every N rows
+_PROGRESS_EVERY = 1000
+
+
+def export_row(r: dict) -> list:
+    """Export row (ordered as EXPORT_HEADERS) for one analytics result."""
+    return [
+        r["rank"],
+        r["full_name"],
+        _GENDER_LABELS.get(r["gender"], r["gender"]),
+        r["halqa_name"],
+        r["supervisor_name"],
+        r["total_score"],
+        r["max_score"],
+        r["cards_count"],
+        r["percentage"],
+    ]
+
+
+def stream_csv_export(filters: dict, on_progress=None, user_id: int = None):
+    """Generate the CSV export in chunks, reading results from a server-side cursor.
+
+    Uses its own session: the request session is closed before a
+    streaming response body is sent. `on_progress(rows_written)` is called
+    periodically and once at the end.
+    """
+    import csv
+
+    db = reporting_session(user_id)
+    try:
+        # UTF-8 BOM so Excel opens Arabic correctly
+        yield "\ufeff".encode("utf-8")
+
+        output = io.StringIO()
+        writer = csv.writer(output)
+        rows_written = 0
+        for r in iter_analytics_results(db, **filters):
+            if not rows_written:
+                writer.writerow(EXPORT_HEADERS)
+            writer.writerow(export_row(r))
+            rows_written += 1
+            if on_progress and rows_written % _PROGRESS_EVERY == 0:
+                on_progress(rows_written)
+            if output.tell() >= _EXPORT_CHUNK_SIZE:
+                yield output.getvalue().encode("utf-8")
+                output.seek(0)
+                output.truncate()
+
+        if output.tell():
+            yield output.getvalue().encode("utf-8")
+        if on_progress:
+            on_progress(rows_written)
+    finally:
+        db.close()
+
+
+def stream_xlsx_export(filters: dict, on_progress=None, user_id: int = None):
+    """Generate the XLSX export with a write-only workbook spooled to a temp file.
+
+    Rows are written as they are read, so no cell objects are kept in
+    memory; the saved file is then streamed back in chunks.
+    `on_progress(rows_written)` is called periodically and once at the end.
+    """
+    import tempfile
+    from openpyxl import Workbook
+
+    db = reporting_session(user_id)
+    try:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("النتائج")
+        ws.sheet_view.rightToLeft = True
+
+        rows_written = 0
+        for r in iter_analytics_results(db, **filters):
+            if not rows_written:
+                ws.append(EXPORT_HEADERS)
+            ws.append(export_row(r))
+            rows_written += 1
+            if on_progress and rows_written % _PROGRESS_EVERY == 0:
+                on_progress(rows_written)
+    finally:
+        db.close()
+
+    with tempfile.TemporaryFile() as spool:
+        wb.save(spool)
+        spool.seek(0)
+        while chunk := spool.read(_EXPORT_CHUNK_SIZE):
+            yield chunk
+    if on_progress:
+        on_progress(rows_written)
@@ -0,0 +1,307 @@
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.user import User
+from app.models.import_job import ImportJob
+from app.utils.passwords import hash_password
+from app.utils.search import normalize_search_text
+from app.utils.workers import worker_id
+
+REQUIRED_HEADERS = ["الاسم", "الجنس", "العمر", "الهاتف", "البريد", "الدولة"]
+TEMPLATE_HEADERS = REQUIRED_HEADERS + ["المصدر"]
+
+GENDER_MAP = {"ذكر": "male", "أنثى": "female", "male": "male", "female": "female"}
+
+DEFAULT_PASSWORD = "123456"
+
+
+@lru_cache(maxsize=1)
+def default_password_hash() -> str:
+    """bcrypt hash of the default password, computed once per process."""
+    return hash_password(DEFAULT_PASSWORD)
+
+
+def _is_empty_row(row) -> bool:
+    return all(cell is None or str(cell).strip() == "" for cell in row)
+
+
+def _row_email(row_data: dict) -> str:
+    raw_email = row_data.get("البريد")
+    return str(raw_email).lower().strip() if raw_email is not None else ""
+
+
+def _user_values(row_data: dict, email: str) -> dict:
+    """Column values for a new pending participant (raises on invalid cells)."""
+    raw_gender = str(row_data.get("الجنس", "")).strip()
+    gender = GENDER_MAP.get(raw_gender, raw_gender)
+
+    raw_age = row_data.get("العمر", 0)
+    age = int(raw_age) if raw_age is not None and str(raw_age).strip() else 0
+
+    full_name = str(row_data.get("الاسم") or "").strip()
+    return {
+        "full_name": full_name,
+        # Bulk inserts skip mapper events, so set the derived column here
+        "search_name": normalize_search_text(full_name),
+        "gender": gender,
+        "age": age,
+        "phone": str(row_data.get("الهاتف") or "").strip(),
+        "email": email,
+        "country": str(row_data.get("الدولة") or "").strip(),
+        "referral_source": str(row_data.get("المصدر") or "").strip(),
+        "status": "pending",
+        "role": "participant",
+        "password_hash": default_password_hash(),
+    }
+
+
+def _insert_users(db: Session, batch: list, errors: list) -> int:
+    """Insert a batch with one multi-row INSERT; on failure retry row by row.
+
+    `batch` is a list of (row_idx, values). Each attempt runs in a savepoint
+    so a failing row only discards itself. Returns the number inserted.
+    """
+    if not batch:
+        return 0
+    try:
+        with db.begin_nested():
+            db.execute(insert(User), [values for _, values in batch])
+        return len(batch)
+    except Exception:
+        pass
+
+    inserted = 0
+    for row_idx, values in batch:
+        try:
+            with db.begin_nested():
+                db.execute(insert(User), [values])
+            inserted += 1
+        except Exception as e:
+            errors.append(f"صف {row_idx}: {str(e)}")
+    return inserted
+
+
+def import_chunk(db: Session, rows: list, seen_emails: set, errors: list) -> int:
+    """Validate and insert one chunk of (row_idx, row_data) pairs.
+
+    Existing emails are looked up with a single IN query for the chunk.
+    Per-row problems are appended to `errors`; returns the number imported.
+    """
+    emails = {_row_email(row_data) for _, row_data in rows}
+    emails.discard("")
+    existing = set()
+    if emails:
+        existing = {e for (e,) in db.query(User.email).filter(User.email.in_(emails))}
+
+    batch = []
+    for row_idx, row_data in rows:
+        try:
+            email = _row_email(row_data)
+            if not email or email == "none":
+                errors.append(f"صف {row_idx}: البريد فارغ")
+                continue
+            if email in seen_emails:
+                errors.append(f"صف {row_idx}: بريد مكرر في الملف")
+                continue
+            if email in existing:
+                errors.append(f"صف {row_idx}: البريد مسجل مسبقاً ({email})")
+                continue
+
+            seen_emails.add(email)
+            batch.append((row_idx, _user_values(row_data, email)))
+        except Exception as e:
+            errors.append(f"صف {row_idx}: {str(e)}")
+
+    return _insert_users(db, batch, errors)
+
+
+def _xlsx_rows(path: str):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _csv_rows(path: str):
+    import csv
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.reader(f)
+
+
+def read_rows(path: str, format: str):
+    """Stream the raw rows of an uploaded file, header row first."""
+    return _csv_rows(path) if format == "csv" else _xlsx_rows(path)
+
+
+def iter_data_rows(rows, headers: list, start: int = 2):
+    """Yield (row_idx, row_data) for the non-empty data rows."""
+    for row_idx, row in enumerate(rows, start=start):
+        if _is_empty_row(row):
+            continue
+        yield row_idx, dict(zip(headers, row))
+
+
+def _check_headers(path: str, format: str):
+    rows = read_rows(path, format)
+    try:
+        headers = list(next(rows, None) or [])
+    finally:
+        rows.close()
+    for h in REQUIRED_HEADERS:
+        if h not in headers:
+            raise HTTPException(400, detail=f"العمود {h} مفقود من الملف")
+
+
+def start_import(db: Session, file: UploadFile, user_id: int) -> ImportJob:
+    """Store the upload, create its import job and run it."""
+    filename = file.filename or ""
+    format = "csv" if filename.lower().endswith(".csv") else "xlsx"
+    job_id = uuid.uuid4().hex
+
+    os.makedirs(settings.IMPORT_DIR, exist_ok=True)
+    path = os.path.join(settings.IMPORT_DIR, f"{job_id}.{format}")
+    with open(path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+
+    try:
+        _check_headers(path, format)
+    except Exception:
+        os.remove(path)
+        raise
+
+    job = ImportJob(
+        id=job_id,
+        filename=filename,
+        format=format,
+        file_path=path,
+        status="running",
+        created_by=user_id,
+        owner=worker_id(),
+    )
+    db.add(job)
+    db.commit()
+    return run_import(db, job)
+
+
+class ImportTakenOver(Exception):
+    """The job was resumed by another worker after this one stopped committing chunks."""
+
+
+def _update_owned(db: Session, job_id: str, **values) -> bool:
+    """Update the job only while this worker still runs it (in the caller's transaction)."""
+    values["updated_at"] = datetime.utcnow()
+    updated = (
+        db.query(ImportJob)
+        .filter(ImportJob.id == job_id, ImportJob.owner == worker_id(), ImportJob.status == "running")
+        .update(values, synchronize_session=False)
+    )
+    return updated == 1
+
+
+def _commit_chunk(db: Session, job_id: str, chunk: list, seen_emails: set, errors: list):
+    imported = import_chunk(db, chunk, seen_emails, errors)
+    progress = {
+        "imported": ImportJob.imported + imported,
+        "last_row": chunk[-1][0],
+        "errors": json.dumps(errors, ensure_ascii=False),
+    }
+    if not _update_owned(db, job_id, **progress):
+        db.rollback()
+        raise ImportTakenOver()
+    db.commit()
+
+
+def run_import(db: Session, job: ImportJob) -> ImportJob:
+    """Import the rows after job.last_row, committing every IMPORT_CHUNK_SIZE rows.
+
+    Each chunk commits together with the job's progress, so a failed import
+    resumes from the first row after the last committed chunk. On resume,
+    duplicates of already imported rows are reported as already registered.
+    """
+    job_id, file_path, last_row = job.id, job.file_path, job.last_row
+    errors = json.loads(job.errors or "[]")
+    seen_emails = set()
+    rows = read_rows(file_path, job.format)
+    try:
+        headers = list(next(rows, None) or [])
+        chunk = []
+        for row_idx, row_data in iter_data_rows(rows, headers):
+            if row_idx <= last_row:
+                continue
+            chunk.append((row_idx, row_data))
+            if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+                _commit_chunk(db, job_id, chunk, seen_emails, errors)
+                chunk = []
+        if chunk:
+            _commit_chunk(db, job_id, chunk, seen_emails, errors)
+    except ImportTakenOver:
+        print(f"Import job {job_id} was resumed by another worker; stopping here")
+        db.refresh(job)
+        return job
+    except Exception as e:
+        db.rollback()
+        if _update_owned(db, job_id, status="failed", error=str(e)):
+            db.commit()
+        db.refresh(job)
+        print(f"Import job {job_id} stopped after row {job.last_row}: {e}")
+        return job
+    finally:
+        rows.close()
+
+    if _update_owned(db, job_id, status="done", error=None, file_path=None):
+        db.commit()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    db.refresh(job)
+    return job
+
+
+def _orphaned():
+    """Running imports whose worker has not committed a chunk for IMPORT_STALE_SECONDS."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.IMPORT_STALE_SECONDS)
+    return and_(ImportJob.status == "running", ImportJob.updated_at < cutoff)
+
+
+def resume_import(db: Session, job: ImportJob) -> ImportJob:
+    """Continue a failed (or orphaned) import from its last committed chunk.
+
+    The job is claimed with a conditional update, so concurrent resumes on
+    any workers run it at most once.
+    """
+    if job.status == "done":
+        raise HTTPException(400, detail="لا يمكن استئناف هذا الاستيراد")
+    if not job.file_path or not os.path.exists(job.file_path):
+        raise HTTPException(409, detail="ملف الاستيراد غير متوفر")
+
+    claimed = (
+        db.query(ImportJob)
+        .filter(ImportJob.id == job.id, or_(ImportJob.status == "failed", _orphaned()))
+        .update(
+            {"status": "running", "error": None, "owner": worker_id(), "updated_at": datetime.utcnow()},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    if not claimed:
+        raise HTTPException(409, detail="الاستيراد قيد التشغيل حالياً")
+    db.refresh(job)
+    return run_import(db, job)
+
+
+def fail_interrupted_imports(db: Session):
+    """Startup: mark orphaned imports failed; imports other workers are running are left alone."""
+    db.query(ImportJob).filter(_orphaned()).update(
+        {"status": "failed", "error": "interrupted"}, synchronize_session=False
+    )
+    db.commit()
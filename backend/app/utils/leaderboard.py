@@ -0,0 +1,91 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.models.halqa import Halqa
+from app.models.rollup import UserScoreTotal
+from app.utils.scores import CARD_MAX_SCORE, percentage
+
+
+def _ranked_members(halqa_id: int = None):
+    """CTE of active members with their totals and rank, one row per member.
+
+    Totals come from the user_score_totals rollup rather than daily_cards.
+
+    - halqa_id given: active members of that halqa.
+    - halqa_id None: all active participants (same set as the supervisor "all halqas" view).
+    """
+    total = func.coalesce(UserScoreTotal.total_score, 0)
+    query = (
+        select(
+            User.id.label("user_id"),
+            User.full_name,
+            Halqa.name.label("halqa_name"),
+            total.label("total_score"),
+            func.coalesce(UserScoreTotal.cards_count, 0).label("cards_count"),
+            func.rank().over(order_by=total.desc()).label("tie_rank"),
+            func.dense_rank().over(order_by=total.desc()).label("dense_rank"),
+            func.row_number().over(order_by=(total.desc(), User.id)).label("position"),
+            func.count().over().label("total_count"),
+        )
+        .select_from(User)
+        .outerjoin(Halqa, User.halqa_id == Halqa.id)
+        .outerjoin(UserScoreTotal, UserScoreTotal.user_id == User.id)
+        .where(User.status == "active")
+    )
+    if halqa_id:
+        query = query.where(User.halqa_id == halqa_id)
+    else:
+        query = query.where(User.role == "participant")
+    return query.cte("ranked_members")
+
+
+def build_leaderboard(
+    db: Session,
+    halqa_id: int = None,
+    limit: int = None,
+    offset: int = 0,
+    around: int = None,
+    window: int = 5,
+):
+    """Return (entries, total) for a leaderboard page in a single statement.
+
+    `rank` is the sequential position (ties broken by member id), as before;
+    `tie_rank` uses RANK() (ties share a rank, gaps follow) and `dense_rank`
+    uses DENSE_RANK(). When `around` is a member id, the page is the `window`
+    entries above and below that member instead of limit/offset.
+    """
+    ranked = _ranked_members(halqa_id)
+    query = select(ranked).order_by(ranked.c.position)
+
+    if around is not None:
+        anchor = select(ranked.c.position).where(ranked.c.user_id == around).scalar_subquery()
+        query = query.where(ranked.c.position.between(anchor - window, anchor + window))
+    else:
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+
+    rows = db.execute(query).all()
+
+    entries = []
+    for row in rows:
+        max_total = row.cards_count * CARD_MAX_SCORE
+        entries.append({
+            "user_id": row.user_id,
+            "full_name": row.full_name,
+            "halqa_name": row.halqa_name or "-",
+            "total_score": row.total_score,
+            "percentage": percentage(row.total_score, max_total),
+            "cards_count": row.cards_count,
+            "rank": row.position,
+            "tie_rank": row.tie_rank,
+            "dense_rank": row.dense_rank,
+        })
+
+    if rows:
+        total = rows[0].total_count
+    else:
+        # Page past the end (or unknown member): count separately
+        total = db.execute(select(func.count()).select_from(ranked)).scalar()
+    return entries, total
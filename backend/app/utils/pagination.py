@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import date, datetime
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# Page size limits for paginated list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values) -> str:
+    """Encode keyset values into an opaque URL-safe cursor."""
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    """Decode a cursor produced by encode_cursor back into typed column values."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(columns):
+            raise ValueError
+        typed = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if python_type in (date, datetime):
+                typed.append(python_type.fromisoformat(value))
+            else:
+                typed.append(python_type(value))
+        return typed
+    except (ValueError, TypeError):
+        raise HTTPException(400, detail="مؤشر الصفحة غير صالح")
+
+
+def keyset_paginate(query, columns, limit: int, cursor: str = None, descending: bool = True):
+    """Return (rows, next_cursor) for one keyset page of `query`.
+
+    `columns` define the sort order; the last one must be unique (usually the id).
+    The query must not be ordered already. next_cursor is None on the last page.
+    """
+    if cursor:
+        key = tuple_(*columns)
+        after = tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(key < after if descending else key > after)
+
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], c.key) for c in columns])
+    return rows, next_cursor
+
+
+def paginated_response(
+    query, columns, key: str, serialize, limit: int = None, cursor: str = None,
+    with_total: bool = False, descending: bool = True,
+) -> dict:
+    """Build {key: [...], "next_cursor": ..., "total"?} for one keyset page of `query`."""
+    response = {}
+    if with_total:
+        response["total"] = query.order_by(None).count()
+    rows, next_cursor = keyset_paginate(query, columns, limit or DEFAULT_PAGE_SIZE, cursor, descending)
+    response[key] = [serialize(row) for row in rows]
+    response["next_cursor"] = next_cursor
+    return response
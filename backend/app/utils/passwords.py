@@ -0,0 +1,121 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException
+from passlib.hash import bcrypt as bcrypt_hash
+from app.config import settings
+
+
+def hash_password(password: str, rounds: int = None) -> str:
+    """bcrypt hash with the configured cost (BCRYPT_ROUNDS)."""
+    return bcrypt_hash.using(rounds=rounds or settings.BCRYPT_ROUNDS).hash(password)
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """Check a password against a stored bcrypt hash (the hash carries its own cost)."""
+    return bcrypt_hash.verify(password, password_hash)
+
+
+class _HashStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+
+_stats = _HashStats()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _workers() -> int:
+    return settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: the server process already runs threads, which fork does not copy safely
+            _executor = ProcessPoolExecutor(
+                max_workers=_workers(), mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _reset_executor(broken: ProcessPoolExecutor):
+    """Drop a broken pool (a worker process died) so the next call starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run(fn, *args):
+    """Run fn in the hashing pool; reject with 503 when the queue is full."""
+    with _stats.lock:
+        if _stats.in_flight >= _workers() + settings.PASSWORD_HASH_MAX_QUEUE:
+            _stats.rejected += 1
+            raise HTTPException(503, detail="الخادم مشغول حالياً، يرجى المحاولة بعد قليل")
+        _stats.in_flight += 1
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        executor = _get_executor()
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            _reset_executor(executor)
+            return await loop.run_in_executor(_get_executor(), fn, *args)
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with _stats.lock:
+            _stats.in_flight -= 1
+            _stats.count += 1
+            _stats.total_ms += elapsed_ms
+            _stats.max_ms = max(_stats.max_ms, elapsed_ms)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password in the dedicated process pool."""
+    return await _run(hash_password, password, settings.BCRYPT_ROUNDS)
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    """Verify a password in the dedicated process pool."""
+    return await _run(verify_password, password, password_hash)
+
+
+def password_hash_stats() -> dict:
+    """Queue depth and latency of the hashing pool (latency includes queue wait)."""
+    workers = _workers()
+    with _stats.lock:
+        return {
+            "workers": workers,
+            "rounds": settings.BCRYPT_ROUNDS,
+            "in_flight": _stats.in_flight,
+            "queued": max(_stats.in_flight - workers, 0),
+            "max_queue": settings.PASSWORD_HASH_MAX_QUEUE,
+            "rejected": _stats.rejected,
+            "completed": _stats.count,
+            "avg_ms": round(_stats.total_ms / _stats.count, 1) if _stats.count else 0,
+            "max_ms": round(_stats.max_ms, 1),
+        }
+
+
+def shutdown_password_pool():
+    """Shutdown: stop the hashing worker processes."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,76 @@
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy import exc
+
+# Upper bounds (ms) of the checkout wait histogram buckets; the last bucket is open-ended
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolStats:
+    """Checkout counters and wait-time histogram for one connection pool."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def record(self, wait_ms: float, outcome: str = "ok"):
+        with self.lock:
+            if outcome == "timeout":
+                self.timeouts += 1
+            elif outcome == "error":
+                self.errors += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.buckets[bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+
+    def snapshot(self, pool) -> dict:
+        with self.lock:
+            attempts = self.checkouts + self.timeouts + self.errors
+            histogram = {
+                f"<={bound}ms": count for bound, count in zip(WAIT_BUCKETS_MS, self.buckets)
+            }
+            histogram[f">{WAIT_BUCKETS_MS[-1]}ms"] = self.buckets[-1]
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "timeout_seconds": pool.timeout(),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "avg_wait_ms": round(self.total_wait_ms / attempts, 2) if attempts else 0,
+                "max_wait_ms": round(self.max_wait_ms, 2),
+                "wait_histogram": histogram,
+            }
+
+
+def instrumented_pool_class(base):
+    """Subclass of a QueuePool class that times every checkout into `stats`.
+
+    The stats live on the class so they survive pool.recreate() (engine.dispose()).
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return base.connect(self)
+        except exc.TimeoutError:
+            outcome = "timeout"
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            self.stats.record((time.perf_counter() - started) * 1000, outcome)
+
+    return type(f"Instrumented{base.__name__}", (base,), {"stats": PoolStats(), "connect": connect})
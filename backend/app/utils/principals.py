@@ -0,0 +1,104 @@
+import threading
+import time
+from dataclasses import dataclass
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.user import User
+from app.models.halqa import Halqa
+
+
+@dataclass(frozen=True)
+class Principal:
+    """What authorization needs to know about the current user.
+
+    Returned by get_active_user and RoleChecker in place of the User row;
+    routes that need the full row use get_current_user.
+
+    Principals are cached per process for up to PRINCIPAL_CACHE_TTL seconds,
+    so halqa_id and supervised_halqa_id may lag a change made on another
+    worker. Use them only for reads and authorization decisions; anything
+    written based on the user's halqa must read it from the users row in the
+    write transaction (see rollups.record_card_write).
+    """
+
+    id: int
+    email: str
+    role: str
+    status: str
+    halqa_id: int | None
+    supervised_halqa_id: int | None
+
+
+_cache = {}  # user_id -> (expires_at, Principal)
+_lock = threading.Lock()
+
+
+def cached_principal(user_id: int) -> Principal | None:
+    """The cached principal for user_id, or None on a miss (no query)."""
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+    return None
+
+
+def load_principal(db: Session, user_id: int) -> Principal | None:
+    """Return the principal for user_id, from the cache or with one query."""
+    principal = cached_principal(user_id)
+    if principal:
+        return principal
+
+    supervised = (
+        select(Halqa.id).where(Halqa.supervisor_id == User.id).limit(1).correlate(User).scalar_subquery()
+    )
+    row = (
+        db.query(User.id, User.email, User.role, User.status, User.halqa_id, supervised)
+        .filter(User.id == user_id)
+        .first()
+    )
+    if not row:
+        return None
+
+    principal = Principal(*row)
+    if settings.PRINCIPAL_CACHE_TTL > 0:
+        now = time.monotonic()
+        with _lock:
+            if len(_cache) >= settings.PRINCIPAL_CACHE_SIZE:
+                # Drop the oldest entry (dicts keep insertion order)
+                _cache.pop(next(iter(_cache)))
+            _cache[user_id] = (now + settings.PRINCIPAL_CACHE_TTL, principal)
+    return principal
+
+
+def invalidate_principals(*user_ids):
+    """Forget cached principals (all of them when no ids are given)."""
+    with _lock:
+        if not user_ids:
+            _cache.clear()
+        for user_id in user_ids:
+            _cache.pop(user_id, None)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_principal_changes(session, flush_context, instances):
+    """Note users whose role, status, halqa or supervised halqa is being changed."""
+    changed = session.info.setdefault("changed_principals", set())
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if any(state.attrs[a].history.has_changes() for a in ("role", "status", "halqa_id")):
+                changed.add(obj.id)
+        elif isinstance(obj, Halqa):
+            history = inspect(obj).attrs.supervisor_id.history
+            changed.update(v for v in (*history.deleted, *history.added) if v)
+    for obj in session.new:
+        if isinstance(obj, Halqa) and obj.supervisor_id:
+            changed.add(obj.supervisor_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_principals(session):
+    changed = session.info.pop("changed_principals", None)
+    if changed:
+        invalidate_principals(*changed)
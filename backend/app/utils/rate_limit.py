@@ -0,0 +1,222 @@
+import ipaddress
+import threading
+import time
+from functools import lru_cache
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from app.config import settings
+from app.database import SessionLocal
+from app.models.rate_limit import RateLimitCounter
+
+# endpoint -> {scope: (max requests, window seconds)}
+RULES = {
+    "login": {"ip": (20, 300), "email": (10, 300)},
+    # Sized for a halqa signing up together from one shared address (NAT, mosque Wi-Fi)
+    "register": {"ip": (30, 3600)},
+    "forgot_password": {"ip": (10, 3600), "email": (3, 3600)},
+    "reset_password": {"ip": (20, 900), "email": (10, 900)},
+    "change_password": {"ip": (20, 300), "email": (10, 300)},
+}
+
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _windows(now: float, window: int):
+    """Start of the current fixed window, the previous one, and how far into the current we are."""
+    current = int(now // window) * window
+    return current, current - window, (now - current) / window
+
+
+def _estimate(previous: int, current: int, elapsed: float) -> float:
+    """Sliding window estimate: the previous window weighted by how much of it still overlaps."""
+    return previous * (1 - elapsed) + current
+
+
+class MemoryRateLimiter:
+    """Counters in process memory; each worker limits independently."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # (key, window_start) -> [count, expires_at]
+        self.last_sweep = 0.0
+
+    def hit(self, keys: list, now: float) -> list:
+        """Count one request against each (key, window); return the sliding estimates."""
+        estimates = []
+        with self.lock:
+            for key, window in keys:
+                current, previous, elapsed = _windows(now, window)
+                entry = self.counters.setdefault((key, current), [0, current + 2 * window])
+                entry[0] += 1
+                before = self.counters.get((key, previous), (0,))[0]
+                estimates.append(_estimate(before, entry[0], elapsed))
+            if now - self.last_sweep >= settings.RATE_LIMIT_SWEEP_INTERVAL:
+                self.last_sweep = now
+                for counter_key in [k for k, (_, expires_at) in self.counters.items() if expires_at <= now]:
+                    del self.counters[counter_key]
+        return estimates
+
+    def size(self) -> int:
+        with self.lock:
+            return len(self.counters)
+
+
+class DatabaseRateLimiter:
+    """Counters in the rate_limit_counters table, shared by every worker."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_sweep = 0.0
+
+    def _increment(self, db, key: str, window_start: int, expires_at: int):
+        upsert_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+        table = RateLimitCounter.__table__
+        if upsert_insert is None:
+            updated = db.execute(
+                table.update()
+                .where(table.c.key == key, table.c.window_start == window_start)
+                .values(count=table.c.count + 1)
+            )
+            if not updated.rowcount:
+                db.execute(insert(table).values(key=key, window_start=window_start, count=1, expires_at=expires_at))
+            return
+        stmt = upsert_insert(table).values(key=key, window_start=window_start, count=1, expires_at=expires_at)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["key", "window_start"], set_={"count": table.c.count + 1},
+        ))
+
+    def hit(self, keys: list, now: float) -> list:
+        """Count one request against each (key, window) in one transaction; return the estimates."""
+        estimates = []
+        db = SessionLocal()
+        try:
+            for key, window in keys:
+                current, previous, elapsed = _windows(now, window)
+                self._increment(db, key, current, current + 2 * window)
+                counts = dict(
+                    db.query(RateLimitCounter.window_start, RateLimitCounter.count)
+                    .filter(RateLimitCounter.key == key, RateLimitCounter.window_start.in_([current, previous]))
+                    .all()
+                )
+                estimates.append(_estimate(counts.get(previous, 0), counts.get(current, 0), elapsed))
+            with self.lock:
+                sweep = now - self.last_sweep >= settings.RATE_LIMIT_SWEEP_INTERVAL
+                if sweep:
+                    self.last_sweep = now
+            if sweep:
+                db.query(RateLimitCounter).filter(RateLimitCounter.expires_at <= now).delete(
+                    synchronize_session=False
+                )
+            db.commit()
+        finally:
+            db.close()
+        return estimates
+
+    def size(self) -> int:
+        db = SessionLocal()
+        try:
+            return db.query(RateLimitCounter).count()
+        finally:
+            db.close()
+
+
+BACKENDS = {
+    "memory": MemoryRateLimiter,
+    "database": DatabaseRateLimiter,
+}
+
+rate_limiter = BACKENDS[settings.RATE_LIMIT_BACKEND]()
+
+_stats_lock = threading.Lock()
+_stats = {}  # (endpoint, scope) -> {"allowed": n, "rejected": n}
+
+
+@lru_cache(maxsize=8)
+def _trusted_networks(proxies: str) -> tuple:
+    return tuple(ipaddress.ip_network(p.strip(), strict=False) for p in proxies.split(",") if p.strip())
+
+
+def _is_trusted(address: str, networks: tuple) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_ip(request: Request) -> str:
+    """The address to rate limit on.
+
+    Behind RATE_LIMIT_TRUSTED_PROXIES, X-Forwarded-For is read right to left and
+    the first address that is not a trusted proxy is the client; anything left of
+    it was supplied by the client and is ignored. Requests from any other peer
+    use the peer address, so clients cannot choose their own key.
+    """
+    peer = request.client.host if request.client else "unknown"
+    networks = _trusted_networks(settings.RATE_LIMIT_TRUSTED_PROXIES)
+    if not networks or not _is_trusted(peer, networks):
+        return peer
+    hops = [hop.strip() for hop in ",".join(request.headers.getlist("x-forwarded-for")).split(",")]
+    for hop in reversed([hop for hop in hops if hop]):
+        if not _is_trusted(hop, networks):
+            return hop
+    return peer
+
+
+def check_rate_limit(endpoint: str, request: Request, email: str = None):
+    """Count this request against the endpoint's limits; raise 429 when any is exceeded.
+
+    Call before any password hashing or email work so rejected requests stay cheap.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    values = {"ip": client_ip(request), "email": email}
+    rules = [(scope, limit, window) for scope, (limit, window) in RULES[endpoint].items() if values[scope]]
+    now = time.time()
+    estimates = rate_limiter.hit(
+        [(f"{endpoint}:{scope}:{values[scope]}", window) for scope, _, window in rules], now
+    )
+
+    retry_after = 0
+    with _stats_lock:
+        for (scope, limit, window), estimate in zip(rules, estimates):
+            counters = _stats.setdefault((endpoint, scope), {"allowed": 0, "rejected": 0})
+            if estimate > limit:
+                counters["rejected"] += 1
+                # Until the current window ends; the previous window's weight keeps falling
+                retry_after = max(retry_after, window - int(now) % window)
+            else:
+                counters["allowed"] += 1
+    if retry_after:
+        raise HTTPException(
+            429,
+            detail="محاولات كثيرة، يرجى المحاولة لاحقاً",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+async def check_rate_limit_async(endpoint: str, request: Request, email: str = None):
+    """check_rate_limit for async endpoints: the counter update runs in the threadpool."""
+    if settings.RATE_LIMIT_ENABLED:
+        await run_in_threadpool(check_rate_limit, endpoint, request, email)
+
+
+def rate_limit_stats() -> dict:
+    """Allowed/rejected counts per endpoint and key type (this process) and the configured limits."""
+    with _stats_lock:
+        counters = {f"{endpoint}:{scope}": dict(values) for (endpoint, scope), values in _stats.items()}
+    return {
+        "enabled": settings.RATE_LIMIT_ENABLED,
+        "backend": settings.RATE_LIMIT_BACKEND,
+        "tracked_counters": rate_limiter.size(),
+        "limits": {
+            endpoint: {scope: {"limit": limit, "window_seconds": window} for scope, (limit, window) in rules.items()}
+            for endpoint, rules in RULES.items()
+        },
+        "requests": counters,
+    }
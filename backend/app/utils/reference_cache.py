@@ -0,0 +1,165 @@
+import threading
+import time
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, aliased
+from app.config import settings
+from app.database import SessionLocal
+from app.models.cache_version import CacheVersion
+from app.models.halqa import Halqa
+from app.models.site_settings import SiteSettings
+from app.models.user import User
+
+SITE_SETTINGS = "site_settings"
+HALQA_DIRECTORY = "halqa_directory"
+
+_entries = {}  # name -> (version, checked_at, value)
+_lock = threading.Lock()
+
+
+def _load_site_settings(db: Session) -> dict | None:
+    site = db.query(SiteSettings).first()
+    if not site:
+        return None
+    return {"id": site.id, "enable_email_notifications": site.enable_email_notifications}
+
+
+def _load_halqa_directory(db: Session) -> dict:
+    Supervisor = aliased(User)
+    rows = (
+        db.query(Halqa.id, Halqa.name, Halqa.supervisor_id, Supervisor.full_name, Supervisor.phone)
+        .outerjoin(Supervisor, Halqa.supervisor_id == Supervisor.id)
+        .order_by(Halqa.id)
+        .all()
+    )
+    halqas = {}
+    supervised = {}
+    for halqa_id, name, supervisor_id, supervisor_name, supervisor_phone in rows:
+        halqas[halqa_id] = (name, supervisor_name, supervisor_phone)
+        if supervisor_id:
+            supervised.setdefault(supervisor_id, name)
+    return {"halqas": halqas, "supervised": supervised}
+
+
+_LOADERS = {
+    SITE_SETTINGS: _load_site_settings,
+    HALQA_DIRECTORY: _load_halqa_directory,
+}
+
+
+def _get(db: Session | None, name: str):
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(name)
+    if entry and now - entry[1] < settings.REFERENCE_CACHE_CHECK_SECONDS:
+        return entry[2]
+    # The version row is read at most once per transaction (not once per serialized row)
+    checked = db.info.setdefault("checked_reference_data", set()) if db is not None else set()
+    if entry and name in checked:
+        return entry[2]
+
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        version = db.query(CacheVersion.version).filter(CacheVersion.name == name).scalar() or 0
+        value = entry[2] if entry and entry[0] == version else _LOADERS[name](db)
+    finally:
+        if own_session:
+            db.close()
+
+    with _lock:
+        _entries[name] = (version, now, value)
+    checked.add(name)
+    return value
+
+
+def get_site_settings(db: Session = None) -> dict | None:
+    """Cached {"id", "enable_email_notifications"} of the settings row, or None if missing."""
+    return _get(db, SITE_SETTINGS)
+
+
+def halqa_directory(db: Session = None) -> dict:
+    """Cached halqa lookups for responses.
+
+    "halqas": halqa_id -> (name, supervisor name, supervisor phone)
+    "supervised": supervisor user id -> name of the halqa they supervise
+    """
+    return _get(db, HALQA_DIRECTORY)
+
+
+def invalidate_reference_cache(*names):
+    """Forget this worker's cached copies (all of them when no names are given)."""
+    with _lock:
+        if not names:
+            _entries.clear()
+        for name in names:
+            _entries.pop(name, None)
+
+
+def ensure_cache_versions(db: Session):
+    """Startup: create the version rows that changes increment."""
+    existing = {name for (name,) in db.query(CacheVersion.name)}
+    for name in _LOADERS:
+        if name not in existing:
+            db.add(CacheVersion(name=name, version=0))
+    db.commit()
+
+
+def _changed(obj, attrs) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+def _user_in_directory(session, user) -> bool:
+    """Whether a user change touches the directory: a supervisor's name/phone, or a supervisor role change."""
+    role = inspect(user).attrs.role.history
+    if "supervisor" in (*role.deleted, *role.added):
+        return True
+    if not _changed(user, ("full_name", "phone")):
+        return False
+    supervises = select(Halqa.id).where(Halqa.supervisor_id == user.id).limit(1)
+    return session.connection().execute(supervises).first() is not None
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_reference_versions(session, flush_context, instances):
+    """Bump the version of each cached dataset this flush changes (in the same transaction)."""
+    changed = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, SiteSettings):
+            changed.add(SITE_SETTINGS)
+        elif isinstance(obj, Halqa):
+            if obj in session.dirty and not _changed(obj, ("name", "supervisor_id")):
+                continue
+            changed.add(HALQA_DIRECTORY)
+        elif isinstance(obj, User) and obj in session.dirty:
+            # Ordinary profile edits must not invalidate every worker's directory
+            if _user_in_directory(session, obj):
+                changed.add(HALQA_DIRECTORY)
+
+    pending = session.info.setdefault("changed_reference_data", set())
+    changed -= pending
+    if not changed:
+        return
+    pending.update(changed)
+    table = CacheVersion.__table__
+    session.connection().execute(
+        table.update().where(table.c.name.in_(changed)).values(version=table.c.version + 1)
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_reference_data(session):
+    session.info.pop("checked_reference_data", None)
+    changed = session.info.pop("changed_reference_data", None)
+    if changed:
+        invalidate_reference_cache(*changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_reference_changes(session):
+    session.info.pop("checked_reference_data", None)
+    # A read inside the rolled-back transaction may have cached the uncommitted data
+    changed = session.info.pop("changed_reference_data", None)
+    if changed:
+        invalidate_reference_cache(*changed)
@@ -0,0 +1,130 @@
+import hashlib
+import hmac
+import secrets
+import string
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.password_reset_token import PasswordResetToken
+
+_sweeper = None
+_sweeper_stop = threading.Event()
+
+
+def generate_reset_token() -> str:
+    """Six-digit reset code from a cryptographic RNG."""
+    return "".join(secrets.choice(string.digits) for _ in range(6))
+
+
+def _hash_token(email: str, token: str) -> str:
+    # Keyed so a leaked table cannot be brute-forced without the secret
+    message = f"{email}:{token}".encode("utf-8")
+    return hmac.new(settings.JWT_SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def _expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.RESET_TOKEN_TTL_SECONDS)
+
+
+class DatabaseResetTokenStore:
+    """Tokens in the password_reset_tokens table, shared by every worker.
+
+    issue/consume only stage changes on the caller's session, so they commit
+    (or roll back) together with the rest of the request.
+    """
+
+    def issue(self, db: Session, email: str, token: str):
+        row = db.get(PasswordResetToken, email)
+        if row is None:
+            row = PasswordResetToken(email=email)
+            db.add(row)
+        row.token_hash = _hash_token(email, token)
+        row.expires_at = _expiry()
+        row.created_at = datetime.utcnow()
+
+    def consume(self, db: Session, email: str, token: str) -> bool:
+        """Delete the token if it matches and has not expired. True on success."""
+        deleted = (
+            db.query(PasswordResetToken)
+            .filter(
+                PasswordResetToken.email == email,
+                PasswordResetToken.token_hash == _hash_token(email, token),
+                PasswordResetToken.expires_at > datetime.utcnow(),
+            )
+            .delete(synchronize_session=False)
+        )
+        return deleted == 1
+
+    def sweep(self, db: Session) -> int:
+        deleted = (
+            db.query(PasswordResetToken)
+            .filter(PasswordResetToken.expires_at <= datetime.utcnow())
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return deleted
+
+
+class MemoryResetTokenStore:
+    """Tokens in process memory (single worker deployments and development)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = {}  # email -> (token_hash, expires_at)
+
+    def issue(self, db: Session, email: str, token: str):
+        with self.lock:
+            self.tokens[email] = (_hash_token(email, token), _expiry())
+
+    def consume(self, db: Session, email: str, token: str) -> bool:
+        with self.lock:
+            entry = self.tokens.get(email)
+            if not entry or entry[1] <= datetime.utcnow():
+                return False
+            if not hmac.compare_digest(entry[0], _hash_token(email, token)):
+                return False
+            del self.tokens[email]
+            return True
+
+    def sweep(self, db: Session) -> int:
+        now = datetime.utcnow()
+        with self.lock:
+            expired = [email for email, (_, expires_at) in self.tokens.items() if expires_at <= now]
+            for email in expired:
+                del self.tokens[email]
+        return len(expired)
+
+
+STORES = {
+    "database": DatabaseResetTokenStore,
+    "memory": MemoryResetTokenStore,
+}
+
+reset_token_store = STORES[settings.RESET_TOKEN_BACKEND]()
+
+
+def _sweep_loop():
+    while not _sweeper_stop.wait(settings.RESET_TOKEN_SWEEP_INTERVAL):
+        db = SessionLocal()
+        try:
+            reset_token_store.sweep(db)
+        except Exception as e:
+            print(f"Reset token sweep failed: {e}")
+        finally:
+            db.close()
+
+
+def start_reset_token_sweeper():
+    """Startup: start the periodic sweep of expired reset tokens."""
+    global _sweeper
+    if _sweeper is None or not _sweeper.is_alive():
+        _sweeper_stop.clear()
+        _sweeper = threading.Thread(target=_sweep_loop, name="reset-token-sweeper", daemon=True)
+        _sweeper.start()
+
+
+def stop_reset_token_sweeper():
+    """Shutdown: stop the sweeper."""
+    _sweeper_stop.set()
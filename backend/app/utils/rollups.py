@@ -0,0 +1,137 @@
+from sqlalchemy import delete, event, func, insert, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.database import disable_statement_timeout
+from app.models.user import User
+from app.models.daily_card import DailyCard
+from app.models.rollup import UserScoreTotal, HalqaDailyTotal
+
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _increment(db: Session, model, keys: dict, deltas: dict):
+    """Add `deltas` to the rollup row identified by `keys`, creating it if missing."""
+    upsert_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if upsert_insert is None:
+        updated = db.execute(
+            model.__table__.update()
+            .where(*[model.__table__.c[k] == v for k, v in keys.items()])
+            .values({k: model.__table__.c[k] + v for k, v in deltas.items()})
+        )
+        if not updated.rowcount:
+            db.execute(insert(model).values(**keys, **deltas))
+        return
+
+    stmt = upsert_insert(model).values(**keys, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={k: model.__table__.c[k] + stmt.excluded[k] for k in deltas},
+    )
+    db.execute(stmt)
+
+
+def _lock_member_halqa(db: Session, user_id: int):
+    """The member's halqa_id read from the users row, locked until commit.
+
+    A concurrent reassignment (see _move_reassigned_members) takes the same
+    lock before moving the member's cards, so it either sees this card or
+    runs first and this read returns the new halqa.
+    """
+    return db.connection().execute(
+        select(User.halqa_id).where(User.id == user_id).with_for_update()
+    ).scalar()
+
+
+def record_card_write(db: Session, user_id: int, card, previous_total=None):
+    """Update the rollups for a card being created or edited.
+
+    Call before committing the card so both land in the same transaction.
+    `previous_total` is the card's stored total before an edit, or None for a new card.
+    The halqa is read from the users row, never from a cached principal.
+    """
+    total_delta = card.compute_total_score() - (previous_total or 0)
+    count_delta = 1 if previous_total is None else 0
+    if not total_delta and not count_delta:
+        return
+
+    deltas = {"total_score": total_delta, "cards_count": count_delta}
+    _increment(db, UserScoreTotal, {"user_id": user_id}, deltas)
+    halqa_id = _lock_member_halqa(db, user_id)
+    if halqa_id:
+        _increment(db, HalqaDailyTotal, {"halqa_id": halqa_id, "date": card.date}, deltas)
+
+
+def move_member_rollups(db: Session, user_id: int, old_halqa_id, new_halqa_id):
+    """Move a member's cards from their old halqa's daily totals to the new halqa's."""
+    per_date = db.connection().execute(
+        select(DailyCard.date, func.sum(DailyCard.total_score), func.count(DailyCard.id))
+        .where(DailyCard.user_id == user_id)
+        .group_by(DailyCard.date)
+    ).all()
+    for card_date, total_score, cards_count in per_date:
+        if old_halqa_id:
+            _increment(
+                db, HalqaDailyTotal, {"halqa_id": old_halqa_id, "date": card_date},
+                {"total_score": -total_score, "cards_count": -cards_count},
+            )
+        if new_halqa_id:
+            _increment(
+                db, HalqaDailyTotal, {"halqa_id": new_halqa_id, "date": card_date},
+                {"total_score": total_score, "cards_count": cards_count},
+            )
+
+
+@event.listens_for(Session, "before_flush")
+def _move_reassigned_members(session, flush_context, instances):
+    """Halqa reassignments carry the member's cards along, in the same transaction."""
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        history = inspect(obj).attrs.halqa_id.history
+        if not history.has_changes():
+            continue
+        # The stored halqa (locked) rather than the session's possibly stale copy
+        old_halqa_id = _lock_member_halqa(session, obj.id)
+        new_halqa_id = history.added[0] if history.added else None
+        if old_halqa_id != new_halqa_id:
+            move_member_rollups(session, obj.id, old_halqa_id, new_halqa_id)
+
+
+def rebuild_rollups(db: Session):
+    """Regenerate all rollup tables from daily_cards (one transaction, no statement timeout)."""
+    disable_statement_timeout(db.connection())
+    db.execute(delete(UserScoreTotal))
+    db.execute(delete(HalqaDailyTotal))
+
+    db.execute(
+        insert(UserScoreTotal).from_select(
+            ["user_id", "total_score", "cards_count"],
+            select(DailyCard.user_id, func.sum(DailyCard.total_score), func.count(DailyCard.user_id))
+            .group_by(DailyCard.user_id),
+        )
+    )
+    db.execute(
+        insert(HalqaDailyTotal).from_select(
+            ["halqa_id", "date", "total_score", "cards_count"],
+            select(User.halqa_id, DailyCard.date, func.sum(DailyCard.total_score), func.count(DailyCard.user_id))
+            .join(User, DailyCard.user_id == User.id)
+            .where(User.halqa_id.isnot(None))
+            .group_by(User.halqa_id, DailyCard.date),
+        )
+    )
+    db.commit()
+
+
+if __name__ == "__main__":
+    # python -m app.utils.rollups
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        rebuild_rollups(session)
+        print("Rollups rebuilt")
+    finally:
+        session.close()
@@ -0,0 +1,95 @@
+from sqlalchemy import inspect, select, text
+from sqlalchemy.orm import Session
+from app.database import disable_statement_timeout
+from app.models.user import User
+from app.models.daily_card import DailyCard
+from app.models.export_job import ExportJob
+from app.models.rollup import UserScoreTotal
+from app.utils.rollups import rebuild_rollups
+from app.utils.scores import score_fields_sum_expr
+from app.utils.search import normalize_search_text
+
+
+# Columns added to tables that existing databases already have: table -> {column: DDL type}
+_ADDED_COLUMNS = {
+    "export_jobs": {
+        "active_key": "VARCHAR(64)",
+        "owner": "VARCHAR(100)",
+        "heartbeat_at": "TIMESTAMP",
+    },
+    "import_jobs": {
+        "owner": "VARCHAR(100)",
+    },
+}
+
+# Indexes that existing databases may still have but the models no longer declare
+_DROPPED_INDEXES = (
+    # Duplicated the unique_user_date index and added a third B-tree write per card
+    "ix_daily_cards_user_date_total",
+)
+
+# Trigram indexes for substring search (PostgreSQL only; other databases fall back to a scan)
+_TRIGRAM_INDEXES = {
+    "ix_users_search_name_trgm": "search_name",
+    "ix_users_email_trgm": "email",
+}
+
+
+def upgrade_schema(engine):
+    """Apply additive schema changes that create_all() does not make on existing tables.
+
+    Backfills and index builds run without the request statement timeout.
+    """
+    columns = {c["name"] for c in inspect(engine).get_columns("daily_cards")}
+    user_columns = {c["name"] for c in inspect(engine).get_columns("users")}
+
+    with engine.begin() as conn:
+        disable_statement_timeout(conn)
+        if "search_name" not in user_columns:
+            conn.execute(text("ALTER TABLE users ADD COLUMN search_name VARCHAR(200)"))
+            users = User.__table__
+            rows = conn.execute(select(users.c.id, users.c.full_name)).all()
+            for user_id, full_name in rows:
+                conn.execute(
+                    users.update().where(users.c.id == user_id)
+                    .values(search_name=normalize_search_text(full_name))
+                )
+
+        if "total_score" not in columns:
+            conn.execute(text("ALTER TABLE daily_cards ADD COLUMN total_score FLOAT NOT NULL DEFAULT 0"))
+            table = DailyCard.__table__
+            conn.execute(table.update().values(total_score=score_fields_sum_expr(table)))
+
+        for table_name, added in _ADDED_COLUMNS.items():
+            existing = {c["name"] for c in inspect(conn).get_columns(table_name)}
+            for column, ddl in added.items():
+                if column not in existing:
+                    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column} {ddl}"))
+
+        for name in _DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+        for table in (DailyCard.__table__, User.__table__, ExportJob.__table__):
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+    if engine.dialect.name == "postgresql":
+        _create_trigram_indexes(engine)
+
+    # Rollup tables added to a database that already has cards start empty
+    with Session(engine) as db:
+        if db.query(DailyCard.id).first() and not db.query(UserScoreTotal.user_id).first():
+            rebuild_rollups(db)
+
+
+def _create_trigram_indexes(engine):
+    try:
+        with engine.begin() as conn:
+            disable_statement_timeout(conn)
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for name, column in _TRIGRAM_INDEXES.items():
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON users USING gin ({column} gin_trgm_ops)"
+                ))
+    except Exception as e:
+        print(f"Could not create trigram search indexes: {e}")
@@ -0,0 +1,141 @@
+import math
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from functools import reduce
+from operator import add
+from sqlalchemy import and_, case, func, true
+from sqlalchemy.orm import Session
+from app.models.daily_card import DailyCard
+
+# Maximum score of a single card (11 fields x 10 points)
+CARD_MAX_SCORE = len(DailyCard.SCORE_FIELDS) * 10
+
+
+def card_total_expr():
+    """SQL expression for the total score of one card (the stored total column)."""
+    return DailyCard.total_score
+
+
+def score_fields_sum_expr(table=DailyCard.__table__):
+    """SQL expression summing the individual score columns (used to backfill the stored total)."""
+    return reduce(add, [func.coalesce(table.c[f], 0) for f in DailyCard.SCORE_FIELDS])
+
+
+def percentage(total, max_total) -> float:
+    """Rounded percentage, matching the per-card DailyCard.percentage formula."""
+    return round((total / max_total) * 100, 1) if max_total > 0 else 0
+
+
+def percentage_ratio_expr(total, cards_count):
+    """SQL expression for the unrounded percentage, with the same float operations as percentage()."""
+    return case((cards_count > 0, total / (cards_count * float(CARD_MAX_SCORE)) * 100), else_=0)
+
+
+_TENTH = Decimal("0.1")
+_HALF_TENTH = Decimal("0.05")
+
+
+def _tenths_at_least(bound: float) -> Decimal:
+    """Smallest one-decimal value d with float(d) >= bound."""
+    d = Decimal(bound).quantize(_TENTH, rounding=ROUND_CEILING)
+    return d - _TENTH if float(d - _TENTH) >= bound else d
+
+
+def _tenths_at_most(bound: float) -> Decimal:
+    """Largest one-decimal value d with float(d) <= bound."""
+    d = Decimal(bound).quantize(_TENTH, rounding=ROUND_FLOOR)
+    return d + _TENTH if float(d + _TENTH) <= bound else d
+
+
+def percentage_filter(ratio, min_pct: float = None, max_pct: float = None) -> list:
+    """Conditions on percentage_ratio_expr() equivalent to min_pct <= percentage() <= max_pct.
+
+    percentage() rounds the float with Python's round() (half to even on the
+    exact binary value), while SQL round() goes half away from zero, so at
+    ties like 1.25 a rounded SQL filter would disagree with the displayed
+    value. The bounds are instead turned into exact thresholds on the ratio.
+    """
+    conditions = []
+    if min_pct is not None and not math.isfinite(min_pct):
+        conditions.append(ratio >= min_pct)
+    elif min_pct is not None:
+        d = _tenths_at_least(min_pct)
+        tie = d - _HALF_TENTH  # x rounds to >= d above this, and at it when d's digit is even
+        threshold = float(tie)
+        if Decimal(threshold) < tie or (Decimal(threshold) == tie and int(d * 10) % 2):
+            threshold = math.nextafter(threshold, math.inf)
+        conditions.append(ratio >= threshold)
+    if max_pct is not None and not math.isfinite(max_pct):
+        conditions.append(ratio <= max_pct)
+    elif max_pct is not None:
+        d = _tenths_at_most(max_pct)
+        tie = d + _HALF_TENTH
+        threshold = float(tie)
+        if Decimal(threshold) > tie or (Decimal(threshold) == tie and int(d * 10) % 2):
+            threshold = math.nextafter(threshold, -math.inf)
+        conditions.append(ratio <= threshold)
+    return conditions
+
+
+def empty_summary() -> dict:
+    """Summary for a user with no cards in the window."""
+    return {"total_score": 0, "max_score": 0, "percentage": 0, "cards_count": 0}
+
+
+def _in_window(start, end):
+    conditions = []
+    if start:
+        conditions.append(DailyCard.date >= start)
+    if end:
+        conditions.append(DailyCard.date <= end)
+    return and_(true(), *conditions)
+
+
+def summarize_windows(db: Session, user_ids, windows: dict) -> dict:
+    """Aggregate card scores per user for several date windows in one grouped query.
+
+    `windows` maps a name to a (start, end) pair; either bound may be None.
+    Each window is a conditional aggregate over the same scan of daily_cards.
+    Returns {user_id: {window_name: summary}} for users with at least one card
+    in any window; use empty_summary() for the others.
+    """
+    columns = [DailyCard.user_id]
+    for name, (start, end) in windows.items():
+        in_window = _in_window(start, end)
+        columns.append(func.sum(case((in_window, card_total_expr()), else_=0)).label(f"{name}_total"))
+        columns.append(func.count(case((in_window, DailyCard.user_id))).label(f"{name}_count"))
+
+    # Only scan the dates covered by at least one window
+    starts = [start for start, _ in windows.values()]
+    ends = [end for _, end in windows.values()]
+    query = db.query(*columns).filter(
+        DailyCard.user_id.in_(user_ids),
+        _in_window(None if None in starts else min(starts), None if None in ends else max(ends)),
+    )
+
+    results = {}
+    for row in query.group_by(DailyCard.user_id).all():
+        summaries = {}
+        for name in windows:
+            cards_count = getattr(row, f"{name}_count")
+            if not cards_count:
+                summaries[name] = empty_summary()
+                continue
+            total = getattr(row, f"{name}_total")
+            max_total = cards_count * CARD_MAX_SCORE
+            summaries[name] = {
+                "total_score": total,
+                "max_score": max_total,
+                "percentage": percentage(total, max_total),
+                "cards_count": cards_count,
+            }
+        results[row.user_id] = summaries
+    return results
+
+
+def summarize_range(db: Session, user_ids, start=None, end=None) -> dict:
+    """Per-user totals, card counts and percentages for one date range.
+
+    Returns {user_id: summary}; users without cards in the range are omitted.
+    """
+    windows = summarize_windows(db, user_ids, {"range": (start, end)})
+    return {user_id: summaries["range"] for user_id, summaries in windows.items()}
@@ -0,0 +1,43 @@
+import re
+from sqlalchemy import false, true
+
+# Arabic harakat/tanween, superscript alef and tatweel
+_DIACRITICS = re.compile("[\u064B-\u065F\u0670\u0640]")
+
+# Letter variants folded to one form so spelling differences still match
+_FOLD = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ؤ": "و",
+    "ئ": "ي", "ى": "ي",
+    "ة": "ه",
+})
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_search_text(text) -> str:
+    """Normalize a name, email or search term for matching.
+
+    Strips Arabic diacritics, folds alef/hamza/ta-marbuta variants,
+    lowercases Latin text and collapses whitespace.
+    """
+    if not text:
+        return ""
+    text = _DIACRITICS.sub("", str(text)).translate(_FOLD).lower()
+    return _SPACES.sub(" ", text).strip()
+
+
+def search_filter(column, term: str):
+    """LIKE condition matching the normalized `term` anywhere in a normalized column.
+
+    An empty term matches everything. A term that normalizes to nothing
+    (only spaces, diacritics or tatweel) matches nothing instead of
+    becoming LIKE '%%'.
+    """
+    if not term:
+        return true()
+    normalized = normalize_search_text(term)
+    if not normalized:
+        return false()
+    escaped = normalized.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.like(f"%{escaped}%", escape="\\")
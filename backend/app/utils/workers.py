@@ -0,0 +1,13 @@
+import os
+import socket
+import uuid
+
+_worker_ids = {}  # pid -> id, so forked workers do not inherit their parent's id
+
+
+def worker_id() -> str:
+    """Identifies this worker process on the jobs it owns (host:pid:random)."""
+    pid = os.getpid()
+    if pid not in _worker_ids:
+        _worker_ids[pid] = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}"
+    return _worker_ids[pid]
@@ -1,10 +1,17 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from app.database import engine, Base, SessionLocal
+from app.database import engine, Base, SessionLocal, dispose_async_engine
 from app.routes import all_routers
 from app.models import User, DailyCard, Halqa, SiteSettings
 from app.config import settings as app_settings
+from app.utils.schema import upgrade_schema
+from app.utils.export_jobs import start_export_jobs, stop_export_jobs
+from app.utils.imports import fail_interrupted_imports
+from app.utils.email_outbox import start_outbox_worker, stop_outbox_worker
+from app.utils.passwords import shutdown_password_pool
+from app.utils.reference_cache import ensure_cache_versions
+from app.utils.reset_tokens import start_reset_token_sweeper, stop_reset_token_sweeper
 
 app = FastAPI(title="Ramadan Program Management API")
 
@@ -24,6 +31,7 @@ async def custom_http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail},
+        headers=exc.headers,
     )
 
 
@@ -36,6 +44,7 @@ for router in all_routers:
 @app.on_event("startup")
 def on_startup():
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
 
     db = SessionLocal()
     try:
@@ -43,6 +52,9 @@ def on_startup():
             db.add(SiteSettings(enable_email_notifications=True))
             db.commit()
 
+        ensure_cache_versions(db)
+        fail_interrupted_imports(db)
+
         # Auto-create super admin if not exists
         admin_email = app_settings.SUPER_ADMIN_EMAIL.lower()
         admin = db.query(User).filter_by(email=admin_email).first()
@@ -64,6 +76,19 @@ def on_startup():
     finally:
         db.close()
 
+    start_export_jobs()
+    start_outbox_worker()
+    start_reset_token_sweeper()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    stop_export_jobs()
+    stop_outbox_worker()
+    stop_reset_token_sweeper()
+    shutdown_password_pool()
+    await dispose_async_engine()
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,159 @@
+"""Peak memory of the XLSX analytics export, streaming vs the old in-memory workbook.
+
+    python scripts/bench_xlsx_export.py                  # 1k, 10k and 100k rows
+    python scripts/bench_xlsx_export.py --rows 50000 200000
+
+For each size, seeds a temporary SQLite database with N active
+participants (all-time totals in the rollup table), then runs each export
+mode in a fresh process and reports its peak RSS, the RSS growth during
+the export, the time taken and the file size. The last column is the
+streaming peak as a fraction of the in-memory peak.
+
+- streaming: stream_xlsx_export (write-only workbook spooled to a temp file)
+- in-memory: the previous export: the full results list, a regular
+  Workbook and a BytesIO copy of the file
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("streaming", "in-memory")
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _use_database(path: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("MAIL_USERNAME", "")
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def seed(path: str, rows: int):
+    _use_database(path)
+    from sqlalchemy import insert
+    from app.database import Base, engine
+    from app.models.halqa import Halqa
+    from app.models.rollup import UserScoreTotal
+    from app.models.user import User
+
+    Base.metadata.create_all(bind=engine)
+    halqas = 50
+    with engine.begin() as conn:
+        conn.execute(insert(Halqa), [{"id": i + 1, "name": f"حلقة {i + 1}"} for i in range(halqas)])
+        batch = 10000
+        for start in range(0, rows, batch):
+            ids = range(start + 1, min(start + batch, rows) + 1)
+            conn.execute(insert(User), [
+                {
+                    "id": i, "full_name": f"مشارك رقم {i}", "search_name": f"مشارك رقم {i}",
+                    "gender": "male" if i % 2 else "female", "age": 20, "phone": "0500000000",
+                    "email": f"user{i}@bench.test", "country": "SA", "status": "active",
+                    "role": "participant", "password_hash": "x", "halqa_id": i % halqas + 1,
+                }
+                for i in ids
+            ])
+            conn.execute(insert(UserScoreTotal), [
+                {"user_id": i, "total_score": float(i % 3000) / 4, "cards_count": i % 30 + 1} for i in ids
+            ])
+
+
+def _export_streaming() -> int:
+    from app.utils.exports import stream_xlsx_export
+
+    return sum(len(chunk) for chunk in stream_xlsx_export({}))
+
+
+def _export_in_memory() -> int:
+    import io
+    from openpyxl import Workbook
+    from app.database import SessionLocal
+    from app.utils.analytics import build_analytics_results
+    from app.utils.exports import EXPORT_HEADERS, export_row
+
+    db = SessionLocal()
+    try:
+        results = build_analytics_results(db)
+    finally:
+        db.close()
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "النتائج"
+    ws.sheet_view.rightToLeft = True
+    if results:
+        ws.append(EXPORT_HEADERS)
+        for r in results:
+            ws.append(export_row(r))
+    output = io.BytesIO()
+    wb.save(output)
+    return len(output.getvalue())
+
+
+def run_mode(path: str, mode: str):
+    """Child process: run one export and print 'peak growth seconds size'."""
+    _use_database(path)
+    import app.models  # noqa: F401  (import everything before the baseline)
+    import app.utils.exports  # noqa: F401
+    import openpyxl  # noqa: F401
+
+    before = _peak_rss_mb()
+    started = time.perf_counter()
+    size = _export_streaming() if mode == "streaming" else _export_in_memory()
+    elapsed = time.perf_counter() - started
+    peak = _peak_rss_mb()
+    print(f"{peak:.1f} {peak - before:.1f} {elapsed:.2f} {size}")
+
+
+def _child(*args) -> list:
+    """Run this script with hidden arguments in a fresh process; the last four words it prints."""
+    return subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *map(str, args)],
+        check=True, capture_output=True, text=True, cwd=BACKEND_DIR,
+    ).stdout.split()[-4:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=list(DEFAULT_SIZES), help="participant counts to export",
+    )
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--seed", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.db, args.seed)
+        return
+    if args.mode:
+        run_mode(args.db, args.mode)
+        return
+
+    print(
+        f"{'rows':>8} {'mode':<10} {'peak RSS MB':>12} {'growth MB':>10} "
+        f"{'seconds':>8} {'bytes':>10} {'vs in-memory':>13}"
+    )
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            # Each size gets its own process: the engine is bound to DATABASE_URL on import
+            _child("--seed", rows, "--db", path)
+            results = {mode: _child("--mode", mode, "--db", path) for mode in MODES}
+        baseline = float(results["in-memory"][0])
+        for mode in MODES:
+            peak, growth, elapsed, size = results[mode]
+            ratio = f"{float(peak) / baseline:.0%}"
+            print(f"{rows:>8} {mode:<10} {peak:>12} {growth:>10} {elapsed:>8} {size:>10} {ratio:>13}")
+
+
+if __name__ == "__main__":
+    main()
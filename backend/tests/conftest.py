@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+# Settings are read when app.config is imported, so configure the test
+# environment before anything from the app is loaded.
+_tmp = tempfile.mkdtemp(prefix="ramadan-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_tmp}/test.db",
+    READ_DATABASE_URL="",
+    SUPER_ADMIN_EMAIL="admin@example.com",
+    SUPER_ADMIN_PASSWORD="secret1",
+    MAIL_USERNAME="",
+    BCRYPT_ROUNDS="4",
+    EXPORT_DIR=f"{_tmp}/exports",
+    IMPORT_DIR=f"{_tmp}/imports",
+)
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app with startup run (tables created, super admin seeded)."""
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db(client):
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def auth_headers():
+    """Authorization headers for a user id."""
+    from app.dependencies import create_access_token
+
+    return lambda user_id: {"Authorization": f"Bearer {create_access_token(user_id)}"}
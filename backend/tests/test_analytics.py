@@ -0,0 +1,216 @@
+"""analytics_query against the per-user loop it replaced.
+
+The oracle below is the baseline admin analytics helper, kept verbatim
+apart from its name: one query per user, totals and percentages in Python.
+Scores are multiples of 0.25 so float sums do not depend on the order the
+database and Python add them in.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.models.daily_card import DailyCard
+from app.models.halqa import Halqa
+from app.models.user import User
+from app.utils.analytics import build_analytics_results
+from app.utils.rollups import rebuild_rollups
+
+
+def baseline_analytics_results(
+    db,
+    gender: str = None,
+    halqa_id: int = None,
+    supervisor: str = None,
+    member: str = None,
+    min_pct: float = None,
+    max_pct: float = None,
+    period: str = "all",
+    date_from: str = None,
+    date_to: str = None,
+    sort_by: str = "score",
+    sort_order: str = "desc",
+):
+    query = db.query(User).filter_by(status="active")
+
+    if gender:
+        query = query.filter_by(gender=gender)
+    if halqa_id:
+        query = query.filter_by(halqa_id=halqa_id)
+    if member:
+        query = query.filter(User.full_name.ilike(f"%{member}%"))
+    if supervisor:
+        halqas = db.query(Halqa).join(User, Halqa.supervisor_id == User.id).filter(
+            User.full_name.ilike(f"%{supervisor}%")
+        ).all()
+        halqa_ids = [h.id for h in halqas]
+        if halqa_ids:
+            query = query.filter(User.halqa_id.in_(halqa_ids))
+
+    users = query.all()
+
+    today = date.today()
+    start_date = None
+    end_date = None
+
+    if date_from:
+        start_date = date.fromisoformat(date_from)
+    elif period == "weekly":
+        start_date = today - timedelta(days=today.weekday())
+    elif period == "monthly":
+        start_date = today.replace(day=1)
+
+    if date_to:
+        end_date = date.fromisoformat(date_to)
+
+    results = []
+    for u in users:
+        card_query = db.query(DailyCard).filter_by(user_id=u.id)
+        if start_date:
+            card_query = card_query.filter(DailyCard.date >= start_date)
+        if end_date:
+            card_query = card_query.filter(DailyCard.date <= end_date)
+
+        cards = card_query.all()
+        total = sum(c.total_score for c in cards)
+        max_total = sum(c.max_score for c in cards) if cards else 0
+        pct = round((total / max_total) * 100, 1) if max_total > 0 else 0
+
+        if min_pct is not None and pct < min_pct:
+            continue
+        if max_pct is not None and pct > max_pct:
+            continue
+
+        results.append({
+            "user_id": u.id,
+            "full_name": u.full_name,
+            "gender": u.gender,
+            "halqa_name": u.halqa.name if u.halqa else "بدون حلقة",
+            "supervisor_name": u.halqa.supervisor.full_name if u.halqa and u.halqa.supervisor else "-",
+            "total_score": total,
+            "max_score": max_total,
+            "percentage": pct,
+            "cards_count": len(cards),
+        })
+
+    if sort_by == "name":
+        results.sort(key=lambda x: x["full_name"], reverse=(sort_order == "desc"))
+    else:
+        results.sort(key=lambda x: x["total_score"], reverse=(sort_order == "desc"))
+
+    for i, r in enumerate(results):
+        r["rank"] = i + 1
+
+    return results
+
+
+def _user(name, gender="male", status="active", role="participant", halqa=None):
+    return User(
+        full_name=name, gender=gender, age=30, phone="0500000000",
+        email=f"{name.lower().replace(' ', '.')}@analytics.test", country="SA",
+        status=status, role=role, password_hash="x", halqa=halqa,
+    )
+
+
+def _cards(user, totals):
+    """One card per day going back from today; each total is spread over two fields."""
+    today = date.today()
+    return [
+        DailyCard(user=user, date=today - timedelta(days=i), quran=min(total, 10), duas=max(total - 10, 0))
+        for i, total in enumerate(totals)
+    ]
+
+
+@pytest.fixture(scope="module")
+def seeded(client):
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    alpha = _user("Supervisor Alpha", role="supervisor")
+    beta = _user("Supervisor Beta", gender="female", role="supervisor")
+    halqa_a = Halqa(name="Analytics A", supervisor=alpha)
+    halqa_b = Halqa(name="Analytics B", supervisor=beta)
+    halqa_c = Halqa(name="Analytics C")
+
+    users = {
+        # 8 cards totalling 11: exactly 1.25%, a rounding tie (Python round gives 1.2)
+        "tie_low": (_user("Tie Low", halqa=halqa_a), [1.375] * 8),
+        # 8 cards totalling 33: exactly 3.75%, rounds to 3.8 either way
+        "tie_high": (_user("Tie High", halqa=halqa_b), [4.125] * 8),
+        "ali": (_user("Ali Hassan", halqa=halqa_a), [12.5, 20, 7.25, 0, 18]),
+        "alia": (_user("Alia Omar", gender="female", halqa=halqa_b), [3.5, 9.75, 14]),
+        "sara": (_user("Sara Nabil", gender="female", halqa=halqa_c), [20] * 12),
+        "no_halqa": (_user("Khaled Nour"), [5.25, 5.25]),
+        "no_cards": (_user("Omar Zaki", halqa=halqa_a), []),
+        "same_a": (_user("Equal One", halqa=halqa_b), [10, 10]),
+        "same_b": (_user("Equal Two", halqa=halqa_b), [10, 10]),
+        "old": (_user("Yusuf Old", halqa=halqa_a), [0] * 30 + [19.5, 19.5]),
+        "pending": (_user("Pending Person", status="pending", halqa=halqa_a), [20, 20]),
+    }
+    db.add_all([alpha, beta, halqa_a, halqa_b, halqa_c])
+    for user, totals in users.values():
+        db.add(user)
+        db.add_all(_cards(user, totals))
+    db.flush()
+    for card in db.query(DailyCard):
+        card.total_score = card.compute_total_score()
+    db.commit()
+    rebuild_rollups(db)
+
+    yield {
+        "ids": {key: user.id for key, (user, _) in users.items()},
+        "halqa_a": halqa_a.id,
+    }
+    db.close()
+
+
+def _filter_cases():
+    today = date.today()
+    return [
+        {},
+        {"period": "weekly"},
+        {"period": "monthly"},
+        {"date_from": (today - timedelta(days=6)).isoformat()},
+        {"date_from": (today - timedelta(days=40)).isoformat(), "date_to": (today - timedelta(days=3)).isoformat()},
+        {"date_to": (today - timedelta(days=1)).isoformat()},
+        {"gender": "female"},
+        {"supervisor": "alpha"},
+        {"supervisor": "nobody matches"},
+        {"member": "ali"},
+        {"min_pct": 1.3},
+        {"max_pct": 1.2},
+        {"min_pct": 1.2, "max_pct": 1.25},
+        {"min_pct": 3.8, "max_pct": 3.8},
+        {"min_pct": 3.75},
+        {"min_pct": 10, "max_pct": 15.5},
+        {"min_pct": 0, "max_pct": 0},
+        {"min_pct": 1.3, "date_from": (today - timedelta(days=10)).isoformat()},
+        {"max_pct": 1.2, "date_from": (today - timedelta(days=10)).isoformat()},
+        {"sort_by": "name", "sort_order": "asc"},
+        {"sort_by": "name", "sort_order": "desc"},
+        {"sort_order": "asc"},
+        {"period": "weekly", "sort_order": "asc", "gender": "male"},
+    ]
+
+
+@pytest.mark.parametrize("filters", _filter_cases(), ids=repr)
+def test_matches_per_user_loop(db, seeded, filters):
+    assert build_analytics_results(db, **filters) == baseline_analytics_results(db, **filters)
+
+
+def test_halqa_filter_matches_per_user_loop(db, seeded):
+    filters = {"halqa_id": seeded["halqa_a"]}
+    assert build_analytics_results(db, **filters) == baseline_analytics_results(db, **filters)
+
+
+@pytest.mark.parametrize("date_range", [{}, {"date_from": "2000-01-01"}], ids=["rollup", "cards"])
+def test_percentage_filter_uses_displayed_rounding(db, seeded, date_range):
+    """At a tie, the filter follows Python's round() (1.25 -> 1.2), not SQL's half-up round (1.3)."""
+    tie_low = seeded["ids"]["tie_low"]
+
+    shown = {r["user_id"]: r for r in build_analytics_results(db, **date_range)}
+    assert shown[tie_low]["percentage"] == 1.2
+
+    at_least = {r["user_id"] for r in build_analytics_results(db, min_pct=1.3, **date_range)}
+    at_most = {r["user_id"] for r in build_analytics_results(db, max_pct=1.2, **date_range)}
+    assert tie_low not in at_least
+    assert tie_low in at_most
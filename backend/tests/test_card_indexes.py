@@ -0,0 +1,65 @@
+"""Query plans of the per-user daily_cards aggregations.
+
+They are served by the unique_user_date (user_id, date) index, so
+daily_cards carries no separate (user_id, date) index.
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event, inspect, text
+
+from app.database import engine
+from app.utils.scores import summarize_range
+
+
+@pytest.fixture(autouse=True)
+def sqlite_only():
+    if engine.dialect.name != "sqlite":
+        pytest.skip("query plans are checked on SQLite")
+
+
+def _query_plans(fn) -> list[str]:
+    """Run fn and return the EXPLAIN QUERY PLAN of each daily_cards SELECT it issued."""
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "daily_cards" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+
+    plans = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            plans.append(" / ".join(row[-1] for row in rows))
+    return plans
+
+
+def _unique_user_date_index() -> str:
+    with engine.connect() as conn:
+        for row in conn.execute(text("PRAGMA index_list(daily_cards)")):
+            columns = [c[2] for c in conn.execute(text(f"PRAGMA index_info('{row[1]}')"))]
+            if row[2] and columns == ["user_id", "date"]:
+                return row[1]
+    raise AssertionError("no unique (user_id, date) index on daily_cards")
+
+
+def test_no_duplicate_user_date_index(client):
+    names = {index["name"] for index in inspect(engine).get_indexes("daily_cards")}
+    assert "ix_daily_cards_user_date_total" not in names
+    assert "ix_daily_cards_date_user_total" in names
+
+
+def test_per_user_range_uses_unique_index(db):
+    start = date.today() - timedelta(days=6)
+    plans = _query_plans(lambda: summarize_range(db, [1, 2], start, date.today()))
+
+    assert plans
+    index = _unique_user_date_index()
+    for plan in plans:
+        assert f"USING INDEX {index} (user_id=? AND date>? AND date<?)" in plan, plan
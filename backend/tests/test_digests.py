@@ -0,0 +1,67 @@
+"""Digests are queued in the email outbox once per (kind, date)."""
+from datetime import date, timedelta
+
+import pytest
+
+from app.config import settings
+from app.models.daily_card import DailyCard
+from app.models.digest_run import DigestRun
+from app.models.email_outbox import EmailOutbox
+from app.models.user import User
+from app.utils import digests
+from app.utils.scores import summarize_range
+
+
+@pytest.fixture
+def mail(monkeypatch, db):
+    monkeypatch.setattr(settings, "MAIL_USERNAME", "bot@digests.test")
+    monkeypatch.setattr(settings, "MAIL_PASSWORD", "x")
+    db.query(EmailOutbox).delete()
+    db.commit()
+    yield
+    db.query(EmailOutbox).delete()
+    db.query(DigestRun).delete()
+    db.commit()
+
+
+@pytest.fixture(scope="module")
+def member(client):
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    user = User(
+        full_name="Digest Member", gender="male", age=20, phone="0500000000",
+        email="member@digests.test", country="SA", status="active",
+        role="participant", password_hash="x",
+    )
+    db.add(user)
+    db.commit()
+    yield user.id
+    db.close()
+
+
+def test_weekly_recipients_match_summarize_range(db, member):
+    week_end = date.today()
+    week_start = week_end - timedelta(days=week_end.weekday())
+    member = db.get(User, member)
+    db.add_all([
+        DailyCard(user=member, date=week_start, quran=7.25, duas=3),
+        DailyCard(user=member, date=week_start - timedelta(days=1), quran=10),
+    ])
+    db.commit()
+
+    recipients = digests.weekly_summary_recipients(db, week_start, week_end)
+    summaries = {email: summary for _, email, summary in recipients}
+    totals = summarize_range(db, [member.id], week_start, week_end)
+    assert summaries["member@digests.test"] == totals[member.id]
+
+
+def test_daily_reminders_are_queued_once_per_date(db, member, mail):
+    target = date(2000, 1, 1)
+
+    first = digests.send_daily_reminders(target)
+    assert first["queued"] == first["recipients"] > 0
+    assert digests.send_daily_reminders(target) is None
+
+    assert db.query(EmailOutbox).count() == first["queued"]
+    assert db.get(DigestRun, ("daily", target)).recipients == first["queued"]
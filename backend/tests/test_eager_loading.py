@@ -0,0 +1,108 @@
+"""List endpoints under STRICT_EAGER_LOADING.
+
+User relationships raise instead of lazy loading, and each response
+issues the same number of statements however many users it lists.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app.config import settings
+from app.database import engine
+from app.models.halqa import Halqa
+from app.models.user import User
+
+
+@pytest.fixture(autouse=True)
+def strict(monkeypatch):
+    monkeypatch.setattr(settings, "STRICT_EAGER_LOADING", True)
+    # Check the reference cache version on every request so counts do not depend on timing
+    monkeypatch.setattr(settings, "REFERENCE_CACHE_CHECK_SECONDS", 0)
+
+
+@pytest.fixture(scope="module")
+def halqa(client):
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    supervisor = User(
+        full_name="Strict Supervisor", gender="male", age=40, phone="0500000000",
+        email="strict.supervisor@eager.test", country="SA", status="active",
+        role="supervisor", password_hash="x",
+    )
+    halqa = Halqa(name="Strict Halqa", supervisor=supervisor)
+    db.add(halqa)
+    db.commit()
+    ids = {"supervisor": supervisor.id, "halqa": halqa.id}
+    db.close()
+    return ids
+
+
+def _add_users(db, halqa_id, count, start):
+    for i in range(start, start + count):
+        db.add(User(
+            full_name=f"Member {i}", gender="male", age=20, phone="0500000000",
+            email=f"member{i}@eager.test", country="SA", status="active", halqa_id=halqa_id,
+            role="participant", password_hash="x",
+        ))
+        db.add(User(
+            full_name=f"Applicant {i}", gender="female", age=20, phone="0500000000",
+            email=f"applicant{i}@eager.test", country="SA", status="pending",
+            role="participant", password_hash="x",
+        ))
+    db.commit()
+
+
+def _statements(client, url, headers) -> int:
+    count = 0
+
+    def on_execute(*args):
+        nonlocal count
+        count += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    assert response.status_code == 200, response.text
+    return count
+
+
+def _endpoints(halqa_id):
+    today = date.today().isoformat()
+    admin = [
+        "/api/admin/users",
+        "/api/admin/users?limit=50",
+        "/api/admin/users?search=member",
+        "/api/admin/registrations",
+        "/api/admin/registrations?status=all",
+        "/api/admin/registrations?limit=50&with_total=true",
+        f"/api/supervisor/members?halqa_id={halqa_id}",
+        "/api/supervisor/members",
+    ]
+    supervisor = [
+        "/api/supervisor/members",
+        "/api/supervisor/members?limit=50",
+        f"/api/supervisor/daily-summary?date={today}",
+        "/api/supervisor/weekly-summary",
+        f"/api/supervisor/range-summary?date_from={today}&date_to={today}",
+        "/api/supervisor/leaderboard",
+    ]
+    return [("admin", url) for url in admin] + [("supervisor", url) for url in supervisor]
+
+
+def test_list_endpoints_do_not_lazy_load(client, db, halqa, auth_headers):
+    headers = {"admin": auth_headers(1), "supervisor": auth_headers(halqa["supervisor"])}
+    endpoints = _endpoints(halqa["halqa"])
+
+    _add_users(db, halqa["halqa"], 3, start=0)
+    for role, url in endpoints:
+        _statements(client, url, headers[role])  # warm the principal and reference caches
+    few = {url: _statements(client, url, headers[role]) for role, url in endpoints}
+
+    _add_users(db, halqa["halqa"], 20, start=3)
+    many = {url: _statements(client, url, headers[role]) for role, url in endpoints}
+
+    assert many == few
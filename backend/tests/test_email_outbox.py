@@ -0,0 +1,88 @@
+"""Outbox delivery: claims are committed before the SMTP send, and old rows are swept."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.email_outbox import EmailOutbox
+from app.utils.email_outbox import deliver_due_emails, sweep_old_emails
+
+
+class FakeSMTP:
+    """Records each send and the message's committed status as another worker would see it."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.sent = []
+
+    def send(self, to, subject, html_body):
+        other = SessionLocal()
+        try:
+            status = other.query(EmailOutbox.status).filter(EmailOutbox.to_address == to).scalar()
+        finally:
+            other.close()
+        self.sent.append((to, status))
+        if to in self.fail:
+            raise OSError("connection refused")
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def outbox(db, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_RATE_PER_SECOND", 0)
+    db.query(EmailOutbox).delete()
+    db.commit()
+    yield db
+    db.query(EmailOutbox).delete()
+    db.commit()
+
+
+def _queue(db, to, **values):
+    message = EmailOutbox(to_address=to, subject="s", html_body="<p>b</p>", **values)
+    db.add(message)
+    db.commit()
+    return message
+
+
+def test_messages_are_claimed_and_committed_before_sending(outbox):
+    ok = _queue(outbox, "ok@outbox.test")
+    bad = _queue(outbox, "bad@outbox.test")
+    smtp = FakeSMTP(fail={"bad@outbox.test"})
+
+    assert deliver_due_emails(outbox, smtp) == 2
+    assert smtp.sent == [("ok@outbox.test", "sending"), ("bad@outbox.test", "sending")]
+
+    outbox.expire_all()
+    assert (ok.status, ok.attempts) == ("sent", 1)
+    assert (bad.status, bad.attempts, bad.last_error) == ("pending", 1, "connection refused")
+    assert bad.next_attempt_at > datetime.utcnow()
+
+
+def test_expired_send_lease_is_claimed_again(outbox):
+    now = datetime.utcnow()
+    leased = _queue(outbox, "leased@outbox.test", status="sending", attempts=1,
+                    next_attempt_at=now + timedelta(minutes=5))
+    expired = _queue(outbox, "expired@outbox.test", status="sending", attempts=1,
+                     next_attempt_at=now - timedelta(seconds=1))
+    smtp = FakeSMTP()
+
+    assert deliver_due_emails(outbox, smtp) == 1
+    assert smtp.sent == [("expired@outbox.test", "sending")]
+    outbox.expire_all()
+    assert (expired.status, expired.attempts) == ("sent", 2)
+    assert leased.status == "sending"
+
+
+def test_sweep_deletes_old_sent_and_failed_messages(outbox):
+    old = datetime.utcnow() - timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS + 1)
+    _queue(outbox, "old-sent@outbox.test", status="sent", created_at=old)
+    _queue(outbox, "old-failed@outbox.test", status="failed", created_at=old)
+    _queue(outbox, "old-pending@outbox.test", status="pending", created_at=old)
+    _queue(outbox, "new-sent@outbox.test", status="sent")
+
+    assert sweep_old_emails(outbox) == 2
+    remaining = {to for (to,) in outbox.query(EmailOutbox.to_address)}
+    assert remaining == {"old-pending@outbox.test", "new-sent@outbox.test"}
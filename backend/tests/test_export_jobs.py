@@ -0,0 +1,41 @@
+"""Failed and orphaned export jobs expire and the sweep removes their files."""
+import os
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.models.export_job import ExportJob
+from app.utils.export_jobs import fail_orphaned_exports, sweep_expired_exports
+
+
+def _job(job_id, **values):
+    return ExportJob(id=job_id, dedup_key=job_id, format="csv", filters="{}", **values)
+
+
+def _touch(name) -> str:
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+    path = os.path.join(settings.EXPORT_DIR, name)
+    open(path, "wb").close()
+    return path
+
+
+def test_orphaned_and_failed_jobs_are_swept(client, db):
+    long_ago = datetime.utcnow() - timedelta(days=1)
+    orphan = _job("orphan", status="running", active_key="orphan", owner="dead-worker", heartbeat_at=long_ago)
+    legacy = _job("legacy", status="failed", finished_at=long_ago)  # failed before failures got an expiry
+    db.add_all([orphan, legacy])
+    db.commit()
+    partials = [_touch("orphan.csv.part"), _touch("legacy.csv.part")]
+
+    assert fail_orphaned_exports(db) == 1
+    db.expire_all()
+    assert orphan.status == "failed"
+    assert orphan.expires_at == orphan.finished_at + timedelta(seconds=settings.EXPORT_TTL_SECONDS)
+
+    # The orphan keeps its error for the TTL; the legacy job is already past it
+    assert sweep_expired_exports(db) == 1
+    orphan.expires_at = long_ago
+    db.commit()
+    assert sweep_expired_exports(db) == 1
+
+    assert db.query(ExportJob).filter(ExportJob.id.in_(["orphan", "legacy"])).count() == 0
+    assert not any(os.path.exists(path) for path in partials)
@@ -0,0 +1,30 @@
+"""Halqa listings count the same members for member_count and submitted_today."""
+from datetime import date
+
+from app.models.daily_card import DailyCard
+from app.models.halqa import Halqa
+from app.models.user import User
+
+
+def _member(name, halqa, status):
+    return User(
+        full_name=name, gender="female", age=20, phone="0500000000",
+        email=f"{name.lower().replace(' ', '.')}@halqas.test", country="SA", status=status,
+        role="participant", password_hash="x", halqa=halqa,
+    )
+
+
+def test_submitted_today_counts_active_members_only(client, db, auth_headers):
+    halqa = Halqa(name="Listing Halqa")
+    active = _member("Active Member", halqa, "active")
+    waiting = _member("Active Without Card", halqa, "active")
+    withdrawn = _member("Withdrawn Member", halqa, "withdrawn")
+    db.add_all([halqa, active, waiting, withdrawn])
+    db.add_all([DailyCard(user=user, date=date.today(), quran=5) for user in (active, withdrawn)])
+    db.commit()
+
+    response = client.get("/api/admin/halqas?submitted_today=true", headers=auth_headers(1))
+    assert response.status_code == 200
+    entry = next(h for h in response.json()["halqas"] if h["id"] == halqa.id)
+    assert entry["member_count"] == 2
+    assert entry["submitted_today"] == 1
@@ -0,0 +1,35 @@
+"""The rate limit key for requests that come through a proxy."""
+import pytest
+from starlette.requests import Request
+
+from app.config import settings
+from app.utils.rate_limit import client_ip
+
+
+def _request(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "client": (peer, 50000), "headers": headers})
+
+
+@pytest.fixture
+def proxies(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1, 10.0.0.0/8")
+
+
+def test_peer_address_without_trusted_proxies():
+    assert client_ip(_request("10.0.0.5", "203.0.113.7")) == "10.0.0.5"
+
+
+def test_forwarded_client_behind_trusted_proxy(proxies):
+    assert client_ip(_request("127.0.0.1", "203.0.113.7")) == "203.0.113.7"
+    # A chain of trusted proxies; the spoofed address the client sent is ignored
+    assert client_ip(_request("127.0.0.1", "198.51.100.1, 203.0.113.7, 10.1.2.3")) == "203.0.113.7"
+
+
+def test_forwarded_header_ignored_from_untrusted_peer(proxies):
+    assert client_ip(_request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+
+def test_proxy_address_when_only_proxies_forwarded(proxies):
+    assert client_ip(_request("127.0.0.1", "10.1.2.3")) == "127.0.0.1"
+    assert client_ip(_request("127.0.0.1")) == "127.0.0.1"
@@ -0,0 +1,46 @@
+"""Halqa daily totals follow the member's current halqa on every write path."""
+from datetime import date
+
+from app.models.halqa import Halqa
+from app.models.rollup import HalqaDailyTotal
+from app.models.user import User
+from app.utils import principals
+
+
+def _submitted_today(db, halqa_id) -> int:
+    db.expire_all()
+    row = db.get(HalqaDailyTotal, (halqa_id, date.today()))
+    return row.cards_count if row else 0
+
+
+def test_card_saved_through_stale_principal_counts_for_new_halqa(client, db, auth_headers):
+    old, new = Halqa(name="Rollup Old"), Halqa(name="Rollup New")
+    member = User(
+        full_name="Moved Member", gender="male", age=20, phone="0500000000",
+        email="moved.member@rollups.test", country="SA", status="active",
+        role="participant", password_hash="x", halqa=old,
+    )
+    db.add_all([old, new, member])
+    db.commit()
+
+    # Another worker cached the principal before the move
+    stale = principals.load_principal(db, member.id)
+    assert stale.halqa_id == old.id
+
+    response = client.post(
+        f"/api/admin/user/{member.id}/assign-halqa", json={"halqa_id": new.id}, headers=auth_headers(1),
+    )
+    assert response.status_code == 200
+    with principals._lock:
+        principals._cache[member.id] = (float("inf"), stale)
+    try:
+        response = client.post(
+            "/api/participant/card", json={"date": date.today().isoformat(), "quran": 5},
+            headers=auth_headers(member.id),
+        )
+    finally:
+        principals.invalidate_principals(member.id)
+    assert response.status_code == 200, response.text
+
+    assert _submitted_today(db, old.id) == 0
+    assert _submitted_today(db, new.id) == 1
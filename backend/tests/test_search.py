@@ -0,0 +1,18 @@
+"""Search terms that normalize to nothing match nothing, not every row."""
+import pytest
+
+from app.utils.analytics import build_analytics_results
+
+
+@pytest.mark.parametrize("term", ["   ", "ــ", "َ"], ids=["spaces", "tatweel", "fatha"])
+def test_blank_after_normalizing_matches_nothing(client, db, auth_headers, term):
+    response = client.get("/api/admin/users", params={"search": term}, headers=auth_headers(1))
+    assert response.status_code == 200
+    assert response.json()["users"] == []
+    assert build_analytics_results(db, member=term) == []
+
+
+def test_empty_search_is_unfiltered(client, auth_headers):
+    everyone = client.get("/api/admin/users", headers=auth_headers(1)).json()["users"]
+    response = client.get("/api/admin/users", params={"search": ""}, headers=auth_headers(1))
+    assert response.json()["users"] == everyone != []
@@ -187,7 +187,7 @@ export default function AdminUsersPage() {
         <button className="btn btn-secondary btn-sm" onClick={downloadTemplate}>📥 قالب الاستيراد</button>
         <label className="btn btn-gold btn-sm" style={{ cursor: 'pointer' }}>
           📤 استيراد Excel
-          <input type="file" accept=".xlsx" style={{ display: 'none' }}
+          <input type="file" accept=".xlsx,.csv" style={{ display: 'none' }}
             onChange={(e) => { handleFileSelect(e.target.files[0]); e.target.value = ''; }} />
         </label>
       </div>